@@ -0,0 +1,405 @@
+"""Timings for the traversal math, start-up imports and per-frame scenes.
+
+Each benchmark sweeps a whole timeline frame by frame, the way a render
+does, at several timeline lengths and integration steps, so the O(n^2)
+legacy paths and the O(n) table paths show up as scaling curves. Results
+are printed and can be saved as JSON and compared with an earlier run:
+
+    python benchmark.py -o before.json
+    python benchmark.py --compare before.json
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from traversal import (Chain, CumulativeIntegral, GradientNoise,
+                       InverseIndex, PiecewiseLinear, cumulative_integral,
+                       sample)
+from traversal import jit, solutions
+from traversal.mel import riemann, riemann_loop
+
+FPS = 24
+LENGTHS = (2.5, 5, 10, 20)
+STEPS = (0.1, 0.01, 0.001)
+# The legacy paths are quadratic, so they stop at this many samples
+LEGACY_BUDGET = 2_000_000
+
+omega_func = PiecewiseLinear.ramp(3 * math.pi, 5 * math.pi, 1, 5)
+
+
+def legacy_piecewise(a, b, f1, f2, t):
+    if t < a:
+        return f1
+    if t > b:
+        return f2
+    return ((f2 - f1) / (b - a)) * (t - a) + f1
+
+
+def legacy_omega(t):
+    return legacy_piecewise(3 * math.pi, 5 * math.pi, 1, 5, t)
+
+
+def legacy_bounce(t):
+    return legacy_piecewise(4 * math.pi - 0.2, 4 * math.pi + 0.2, 2, -2, t)
+
+
+def legacy_integrate(t, func, d=0.01):
+    """The scenes' original integrate: resample from 0 on every call."""
+    samples = np.array([func(x * d) for x in range(0, int(t / d))])
+    if len(samples) < 2:
+        return 0.0
+    return float(np.sum(samples[1:] + samples[:-1]) * d / 2)
+
+
+def frames(length: float) -> np.ndarray:
+    return np.arange(1, int(length * FPS) + 1) / FPS
+
+
+def sweep(function: Callable, times) -> Callable:
+    """Workload calling function once per frame, as an updater does."""
+    return lambda: [function(t) for t in times]
+
+
+def ramp(t):
+    """omega_func as a plain vectorized function, so it has to be sampled."""
+    return 1 + 4 * np.clip((t - 3 * math.pi) / (2 * math.pi), 0, 1)
+
+
+def integrate_cases(length: float, step: float):
+    times = frames(length)
+    yield "legacy", len(times) * length / step, sweep(
+        lambda t: legacy_integrate(t, legacy_omega, step), times)
+
+    def per_frame():
+        table = CumulativeIntegral(ramp, step)
+        return [table(t) for t in times]
+
+    yield "table per frame", len(times), per_frame
+    yield "table vectorized", len(times), lambda: CumulativeIntegral(
+        ramp, step)(times)
+    yield "exact vectorized", len(times), lambda: omega_func.integral(times)
+
+
+def good_solution_cases(length: float, step: float):
+    times = frames(length)
+    yield "legacy", len(times) * length / step, sweep(
+        lambda t: np.sin(legacy_integrate(t, legacy_omega, step)), times)
+    yield "exact per frame", len(times), sweep(
+        lambda t: np.sin(omega_func.integral(t)), times)
+    yield "exact vectorized", len(times), lambda: np.sin(
+        omega_func.integral(times))
+
+
+def noise_func_cases(length: float, step: float):
+    times = frames(length)
+    bounce = PiecewiseLinear.ramp(4 * math.pi - 0.2, 4 * math.pi + 0.2, 2,
+                                  -2)
+    try:
+        from perlin_noise import PerlinNoise
+    except ImportError:
+        pass
+    else:
+        perlin = PerlinNoise(seed=15)
+        yield "perlin_noise", len(times) * length / step, sweep(
+            lambda t: 3 * perlin(0.3 * legacy_integrate(t, bounce, step)),
+            times)
+    noise = GradientNoise(seed=15)
+    yield "gradient per frame", len(times), sweep(
+        lambda t: 3 * noise(0.3 * cumulative_integral(bounce)(t)), times)
+    yield "gradient vectorized", len(times), lambda: 3 * noise(
+        0.3 * cumulative_integral(bounce)(times))
+
+
+def mel_riemann_cases(length: float, step: float):
+    # oscillate.mel always steps one frame; length is in seconds at 24 fps
+    times = frames(length) * FPS
+    yield "loop", len(times)**2 / 2, sweep(
+        lambda frame: riemann_loop(legacy_omega, frame), times)
+    yield "vectorized", len(times), lambda: riemann(
+        lambda t: sample(legacy_omega, t), times)
+
+
+def bisect_phase(integral: Callable, phase: float, end: float) -> float:
+    """Earliest time integral reaches phase, by forward lookups."""
+    lo, hi = 0.0, end
+    while hi - lo > 1e-9:
+        mid = (lo + hi) / 2
+        if integral(mid) < phase:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+def inverse_cases(length: float, step: float):
+    # One target phase per frame, as when retiming a clip onto Ω
+    peaks = np.linspace(0, omega_func.integral(length), len(frames(length)))
+
+    def forward():
+        table = CumulativeIntegral(ramp, step)
+        return [bisect_phase(table, peak, length) for peak in peaks]
+
+    yield "forward bisection", len(peaks) * 40, forward
+    yield "index", len(peaks), lambda: InverseIndex(ramp, 0, length,
+                                                    step).first(peaks)
+
+
+def jit_cases(length: float, step: float):
+    # The shipped plain-code rate functions, built on solutions.piecewise
+    times = frames(length)
+    for name, func in (("omega", solutions.omega), ("bounce",
+                                                    solutions.bounce_rate)):
+        kernels = [("numpy", jit.RateKernel(func, native=False))]
+        if jit.AVAILABLE:
+            kernels.append(("jit", jit.RateKernel(func, native=True)))
+        for path, kernel in kernels:
+            # Compile outside the timed runs
+            jit.integrate(kernel, times[:1], step)
+            yield f"{name} {path}", len(times), (
+                lambda kernel=kernel: jit.integrate(kernel, times, step))
+
+
+def chain_cases(length: float, step: float):
+    # Noise traversed along bounce, itself traversed along omega
+    times = frames(length)
+    bounce = PiecewiseLinear.ramp(4 * math.pi - 0.2, 4 * math.pi + 0.2, 2,
+                                  -2)
+    noise = GradientNoise(seed=15)
+    chain = Chain().traverse(ramp, step).traverse(bounce).remap(0.3).warp(
+        noise).remap(3)
+    # The inner traversal runs up to 5 times as fast as the timeline
+    yield "legacy", len(times) * 6 * length / step, sweep(
+        lambda t: 3 * noise(0.3 * legacy_integrate(
+            legacy_integrate(t, legacy_omega, step), legacy_bounce, step)),
+        times)
+    yield "nested per frame", len(times), sweep(chain, times)
+
+    def per_frame():
+        compiled = chain.compile(0, length, step)
+        return [compiled(t) for t in times]
+
+    yield "compiled per frame", len(times), per_frame
+    yield "compiled vectorized", len(times), lambda: chain.compile(
+        0, length, step)(times)
+
+
+BENCHMARKS = {
+    "integrate": integrate_cases,
+    "good_solution": good_solution_cases,
+    "noise_func": noise_func_cases,
+    "mel_riemann": mel_riemann_cases,
+    "inverse": inverse_cases,
+    "jit": jit_cases,
+    "chain": chain_cases,
+}
+
+
+def best_time(workload: Callable, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_math(names, lengths, steps, repeat: int) -> List[Dict]:
+    results = []
+    for name in names:
+        # mel_riemann has a fixed step of one frame
+        for step in steps if name != "mel_riemann" else (1,):
+            for length in lengths:
+                cumulative_integral.cache_clear()
+                for variant, work, workload in BENCHMARKS[name](length, step):
+                    if work > LEGACY_BUDGET:
+                        continue
+                    seconds = best_time(workload, repeat)
+                    results.append({
+                        "benchmark": name,
+                        "variant": variant,
+                        "length": length,
+                        "step": step,
+                        "frames": len(frames(length)),
+                        "seconds": seconds,
+                    })
+                    report(results[-1])
+    return results
+
+
+def run_scenes(repeat: int) -> List[Dict]:
+    """Seconds of updater work per played frame for every scene.
+
+    Only `update_to_time` is timed, which advances the animations and runs
+    every updater for one frame. Building the scene, LaTeX and drawing the
+    pixels are left out, and no files are written.
+    """
+    try:
+        import manim
+        import explanatory_animations
+    except ImportError as error:
+        print(f"scene benchmarks skipped: {error}")
+        return []
+    results = []
+    scenes = [
+        value for value in vars(explanatory_animations).values()
+        if isinstance(value, type) and issubclass(value, manim.Scene) and
+        value.__module__ == explanatory_animations.__name__
+    ]
+    for scene_class in scenes:
+        best = math.inf
+        count = 0
+        for _ in range(repeat):
+            with manim.tempconfig({
+                    "dry_run": True,
+                    "quality": "low_quality",
+                    "disable_caching": True,
+                    "verbosity": "ERROR",
+                    "progress_bar": "none",
+            }):
+                scene = scene_class()
+                played = time_frames(scene)
+                scene.render()
+            if played:
+                count = len(played)
+                best = min(best, sum(played) / count)
+        results.append({
+            "benchmark": "scene_frame",
+            "variant": scene_class.__name__,
+            "frames": count,
+            "seconds": best,
+        })
+        report(results[-1])
+    return results
+
+
+def time_frames(scene) -> List[float]:
+    """Records the seconds each of scene's frames spends in its updaters."""
+    played = []
+    update_to_time = scene.update_to_time
+
+    def timed(t):
+        start = time.perf_counter()
+        update_to_time(t)
+        played.append(time.perf_counter() - start)
+
+    scene.update_to_time = timed
+    return played
+
+
+IMPORTS = {
+    "interpreter": "pass",
+    "numpy": "import numpy",
+    "traversal": "import traversal",
+    "solutions": "from traversal.solutions import good_solution; "
+    "good_solution(1.0)",
+    "scenes": "import explanatory_animations",
+}
+
+
+def run_imports(repeat: int) -> List[Dict]:
+    """Seconds for a fresh interpreter to start and run each import."""
+    results = []
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name, statement in IMPORTS.items():
+        if name == "scenes" and importlib.util.find_spec("manim") is None:
+            print("scene import benchmark skipped: manim is not installed")
+            continue
+        best = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", statement],
+                           cwd=here,
+                           check=True)
+            best = min(best, time.perf_counter() - start)
+        results.append({
+            "benchmark": "import",
+            "variant": name,
+            "seconds": best,
+        })
+        report(results[-1])
+    return results
+
+
+def report(result: Dict):
+    where = " ".join(f"{key}={result[key]}" for key in ("length", "step")
+                     if key in result)
+    print(f"{result['benchmark']:>14} {result['variant']:<20} {where:<22} "
+          f"{result['seconds'] * 1e3:10.3f} ms")
+
+
+def compare(results: List[Dict], baseline: List[Dict]):
+    """Prints the ratio of each result to the matching baseline entry."""
+
+    def key(result):
+        return tuple(
+            result.get(name)
+            for name in ("benchmark", "variant", "length", "step"))
+
+    before = {key(result): result["seconds"] for result in baseline}
+    for result in results:
+        old = before.get(key(result))
+        if old:
+            print(f"{' '.join(str(part) for part in key(result) if part)}: "
+                  f"{result['seconds'] / old:.2f}x")
+
+
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                capture_output=True,
+                                text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only",
+                        nargs="+",
+                        choices=sorted(BENCHMARKS) + ["imports", "scenes"],
+                        help="benchmarks to run, default all")
+    parser.add_argument("--lengths",
+                        nargs="+",
+                        type=float,
+                        default=LENGTHS,
+                        help="timeline lengths in seconds")
+    parser.add_argument("--steps", nargs="+", type=float, default=STEPS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="save results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    args = parser.parse_args(argv)
+
+    names = args.only or sorted(BENCHMARKS) + ["imports", "scenes"]
+    results = run_math([name for name in names if name in BENCHMARKS],
+                       args.lengths, args.steps, args.repeat)
+    if "imports" in names:
+        results += run_imports(args.repeat)
+    if "scenes" in names:
+        results += run_scenes(args.repeat)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump({"meta": metadata(), "results": results}, out, indent=1)
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(results, json.load(baseline)["results"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
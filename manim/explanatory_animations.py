@@ -1,50 +1,74 @@
+import weakref
 from typing import Sequence
 from manim import *
-from perlin_noise import PerlinNoise
+from traversal import instrument, sample
+from traversal.scene import TraversalScene
+from traversal.solutions import (bad_solution, bounce, good_solution,
+                                 good_solution_integrate, noise_solution,
+                                 omega_func)
 
 AXIS_LENGTH = 8 * PI
 TIME_LENGTH = 10
-RIEMANN_STEP = 0.01
 
 # Output settings:
 # PNG Sequence: manim render -a --format png --fps 24 -r 1920,1080 .\manim\explanatory_animations.py
 # Gif: manim render -a --format gif --quality l .\manim\explanatory_animations.py
-
-
-def piecewise(a, b, f1, f2, t):
-    """Piecewise function that is constant until (a, f1), then ramps to (b, f2)"""
-    if (t < a):
-        return f1
-    if t > b:
-        return f2
-    return ((f2 - f1) / (b - a)) * (t - a) + f1
-
-
-def omega_func(t):
-    return piecewise(3 * PI, 5 * PI, 1, 5, t)
-
-
-def bad_solution(t):
-    return np.sin(omega_func(t) * t)
-
-
-def integrate(t, func: Callable[[float], float]):
-    # DONT FORGET TO MAKE SMALLER FOR FINAL EXPORT
-    d = RIEMANN_STEP
-    samples = [func(x * d) for x in range(0, int(t / d))]
-    return np.trapz(samples, dx=d)
-
-
-def good_solution_integrate(t):
-    return integrate(t, omega_func)
-    # DONT FORGET TO MAKE SMALLER FOR FINAL EXPORT
-    # d = RIEMANN_STEP
-    # samples = [omega_func(x * d) for x in range(0, int(t / d))]
-    # return np.trapz(samples, dx=d)
-
-
-def good_solution(t):
-    return np.sin(good_solution_integrate(t))
+# Either one split across all cores: python .\manim\render_parallel.py -a --format png --fps 24 -r 1920,1080
+
+
+class FrameMemo:
+    """Function values at a tracker's current value, computed once per frame
+
+    All updaters driven by the same tracker share one memo, so a traversal
+    function used by a ball, a dot and a label is evaluated once each frame
+    instead of once per updater. Values are dropped when the tracker moves.
+    """
+    _memos = weakref.WeakKeyDictionary()
+
+    def __init__(self, tracker: ValueTracker):
+        self.tracker = tracker
+        self._time = None
+        self._values = {}
+
+    @classmethod
+    def of(cls, tracker: ValueTracker) -> "FrameMemo":
+        """The memo shared by every updater driven by tracker"""
+        memo = cls._memos.get(tracker)
+        if memo is None:
+            memo = cls._memos[tracker] = cls(tracker)
+        return memo
+
+    def __call__(self, function: Callable[[float], float]):
+        t = self.tracker.get_value()
+        if t != self._time:
+            self._time = t
+            self._values.clear()
+        if function not in self._values:
+            instrument.count_call("memo miss", function)
+            self._values[function] = function(t)
+        return self._values[function]
+
+
+def reveal(curve: ParametricFunction,
+           tracker: ValueTracker,
+           name: str = "graph") -> VMobject:
+    """Copy of curve drawn from its start up to the tracker's value
+
+    curve is sampled once over its whole range, so each frame only cuts the
+    precomputed path and never calls the plotted function again.
+    """
+    times = np.append(np.arange(curve.t_min, curve.t_max, curve.t_step),
+                      curve.t_max)
+
+    def update(partial: VMobject):
+        t = np.clip(tracker.get_value(), times[0], times[-1])
+        k = min(np.searchsorted(times, t, side="right"), len(times) - 1) - 1
+        alpha = (k + (t - times[k]) /
+                 (times[k + 1] - times[k])) / (len(times) - 1)
+        partial.pointwise_become_partial(curve, 0, alpha)
+
+    return curve.copy().add_updater(instrument.timed(name, update),
+                                    call_updater=True)
 
 
 def build_animated_graph(
@@ -65,10 +89,13 @@ def build_animated_graph(
                 y_length=y_length,
                 axis_config=axis_config)
 
-    graph = always_redraw(lambda: axes.plot(
-        function, x_range=[0, tracker.get_value()]).set_color(YELLOW))
-    dot = always_redraw(
-        lambda: Dot(fill_color=BLUE).scale(1).move_to(graph.get_end()))
+    graph = reveal(
+        axes.plot(lambda t: sample(function, t),
+                  x_range=[0, x_range[1]],
+                  use_vectorized=True).set_color(YELLOW), tracker)
+    dot = Dot(fill_color=BLUE).add_updater(
+        instrument.timed("graph dot", lambda m: m.move_to(graph.get_end())),
+        call_updater=True)
     graph_group = Group(axes, graph, dot)
     if label != None:
         title = label.next_to(axes, DOWN, buff=0.2)
@@ -86,9 +113,12 @@ def build_bouncing_ball(function: Callable[[float], float],
                     x_length=x_length,
                     y_range=y_range,
                     y_length=y_length).set_opacity(0)
-    dot = always_redraw(
-        lambda: Dot(fill_color=BLUE, radius=x_length / 2).move_to(
-            dot_axes.coords_to_point(0, function(tracker.get_value()))))
+    memo = FrameMemo.of(tracker)
+    dot = Dot(fill_color=BLUE, radius=x_length / 2).add_updater(
+        instrument.timed(
+            "bouncing ball",
+            lambda m: m.move_to(dot_axes.coords_to_point(0, memo(function)))),
+        call_updater=True)
     return Group(dot_axes, dot)
 
 
@@ -130,7 +160,7 @@ def build_side_by_side(functions: tuple[Mobject, Callable[[float], float]],
     return full_group
 
 
-class SimpleSine(Scene):
+class SimpleSine(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
@@ -159,12 +189,10 @@ class SimpleSine(Scene):
         title2 = MathTex(r"\omega = 1").next_to(title, DOWN)
 
         self.add(graph_and_dot, title, title2)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class ExpandContract(Scene):
+class ExpandContract(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.25)
@@ -180,8 +208,7 @@ class ExpandContract(Scene):
             lambda x: np.sin(tracker.get_value() * x),
             x_range=[0, (4 * PI) / tracker.get_value()]).set_color(YELLOW))
 
-        omega_label = always_redraw(
-            lambda: MathTex(f"\\omega = ").next_to(sine_axes, DOWN, buff=0.2))
+        omega_label = MathTex(f"\\omega = ").next_to(sine_axes, DOWN, buff=0.2)
 
         num = DecimalNumber(0)
         num.add_updater(lambda m: m.set_value(tracker.get_value()))
@@ -192,15 +219,13 @@ class ExpandContract(Scene):
         group = Group(sine_axes, sine_graph, label_grp).move_to(ORIGIN, ORIGIN)
 
         self.add(group)
-        self.play(tracker.animate.set_value(2), run_time=2, rate_func=linear)
+        self.play_sweep(tracker, 2, run_time=2)
         self.wait()
-        self.play(tracker.animate.set_value(0.25),
-                  run_time=2,
-                  rate_func=linear)
+        self.play_sweep(tracker, 0.25, run_time=2)
         self.wait()
 
 
-class MysteryFunction(Scene):
+class MysteryFunction(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
@@ -243,12 +268,10 @@ class MysteryFunction(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class MysteryFunctionLabeled(Scene):
+class MysteryFunctionLabeled(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
@@ -301,19 +324,14 @@ class MysteryFunctionLabeled(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class NoiseFunctionLabeled(Scene):
+class NoiseFunctionLabeled(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
-        noise = PerlinNoise(seed=420)
-
-        def noise_func(x):
-            return 3 * noise(0.3 * good_solution_integrate(x))
+        noise_func = noise_solution(seed=420)
 
         f_graph = build_animated_graph(MathTex(
             r"f(t) =\text{noise}(\int_{0}^t \omega (x) \, dx)").scale(0.75),
@@ -363,22 +381,14 @@ class NoiseFunctionLabeled(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class NoiseFunctionBounce(Scene):
+class NoiseFunctionBounce(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
-        noise = PerlinNoise(seed=15)
-
-        def bounce(t: float) -> float:
-            return piecewise(4 * PI - 0.2, 4 * PI + 0.2, 2, -2, t)
-
-        def noise_func(x: float) -> float:
-            return 3 * noise(0.3 * integrate(x, bounce))
+        noise_func = noise_solution(seed=15, func=bounce)
 
         f_graph = build_animated_graph(MathTex(
             r"f(t) = \text{noise}(\int_{0}^t \omega (x) \, dx)").scale(0.75),
@@ -428,12 +438,10 @@ class NoiseFunctionBounce(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class BadFunction(Scene):
+class BadFunction(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
@@ -477,12 +485,10 @@ class BadFunction(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class BadFunctionExplanation(Scene):
+class BadFunctionExplanation(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
@@ -530,12 +536,10 @@ class BadFunctionExplanation(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class GoodFunctionExplanation(Scene):
+class GoodFunctionExplanation(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
@@ -583,12 +587,10 @@ class GoodFunctionExplanation(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class GoodFunctionExplanationLabeled(Scene):
+class GoodFunctionExplanationLabeled(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(0.01)
@@ -636,12 +638,10 @@ class GoodFunctionExplanationLabeled(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
 
 
-class SpeedVariation(Scene):
+class SpeedVariation(TraversalScene):
 
     def construct(self):
         tracker = ValueTracker(1)
@@ -658,9 +658,13 @@ class SpeedVariation(Scene):
                 'include_ticks': False,
                 'include_tip': False
             })
-        omega_title = always_redraw(lambda: MathTex(
-            "\\omega (t) = ", f"{omega_func(tracker.get_value()):.2f}").scale(
-                0.9).next_to(omega_graph_axes, DOWN, buff=0.2))
+        memo = FrameMemo.of(tracker)
+
+        omega_title = always_redraw(
+            instrument.timed(
+                "omega label", lambda: MathTex(
+                    "\\omega (t) = ", f"{memo(omega_func):.2f}").scale(
+                        0.9).next_to(omega_graph_axes, DOWN, buff=0.2)))
 
         omega_graph = Group(omega_graph_axes, omega_title)
 
@@ -674,27 +678,33 @@ class SpeedVariation(Scene):
                 'include_tip': False
             })
 
-        oscillate_graph = always_redraw(
-            lambda: oscillate_axes.plot_parametric_curve(
+        oscillate_graph = reveal(
+            oscillate_axes.plot_parametric_curve(
                 lambda t: [good_solution_integrate(t),
                            good_solution(t)],
-                t_range=[0, tracker.get_value()]).set_color(YELLOW))
-        oscillate_dot = always_redraw(lambda: Dot(fill_color=BLUE).scale(1).
-                                      move_to(oscillate_graph.get_end()))
-        oscillate_arrow = always_redraw(
-            lambda: oscillate_axes.plot_parametric_curve(
-                lambda t: [good_solution_integrate(t), 1.75],
-                t_range=[0, tracker.get_value()]).set_color(GREEN))
-        oscillate_arrowhead = always_redraw(
-            lambda: ArrowTriangleFilledTip(fill_color=GREEN).scale(0.7).rotate(
-                PI).move_to(oscillate_arrow.get_end()))
-
-        oscillate_arrowhead_title = always_redraw(lambda: MathTex(
-            r"\omega (t)=",
-            f"{np.round(omega_func(tracker.get_value()), 2):.2f}",
-            r"\text{ units}/\text{s}",
-            font_size=25).set_color(GREEN).next_to(
-                oscillate_arrow, np.array((0.4, 0.65, 0)), buff=0.1))
+                t_range=[0, AXIS_LENGTH],
+                use_vectorized=True).set_color(YELLOW), tracker, "f(t) curve")
+        oscillate_dot = Dot(fill_color=BLUE).add_updater(
+            lambda m: m.move_to(oscillate_graph.get_end()), call_updater=True)
+        oscillate_arrow = reveal(
+            oscillate_axes.plot_parametric_curve(
+                lambda t: [good_solution_integrate(t),
+                           np.full_like(t, 1.75)],
+                t_range=[0, AXIS_LENGTH],
+                use_vectorized=True).set_color(GREEN), tracker, "omega arrow")
+        oscillate_arrowhead = ArrowTriangleFilledTip(
+            fill_color=GREEN).scale(0.7).rotate(PI).add_updater(
+                lambda m: m.move_to(oscillate_arrow.get_end()),
+                call_updater=True)
+
+        oscillate_arrowhead_title = always_redraw(
+            instrument.timed(
+                "omega arrow label", lambda: MathTex(
+                    r"\omega (t)=",
+                    f"{np.round(memo(omega_func), 2):.2f}",
+                    r"\text{ units}/\text{s}",
+                    font_size=25).set_color(GREEN).next_to(
+                        oscillate_arrow, np.array((0.4, 0.65, 0)), buff=0.1)))
         oscillate_title = MathTex("f(t)").next_to(oscillate_axes,
                                                   DOWN,
                                                   buff=0.2)
@@ -716,6 +726,4 @@ class SpeedVariation(Scene):
         full_group.move_to(ORIGIN, ORIGIN)
 
         self.add(full_group)
-        self.play(tracker.animate.set_value(AXIS_LENGTH),
-                  run_time=TIME_LENGTH,
-                  rate_func=linear)
+        self.play_sweep(tracker, AXIS_LENGTH, run_time=TIME_LENGTH)
@@ -0,0 +1,228 @@
+"""Renders each scene as frame-range segments in parallel, joined in order.
+
+Every frame of a traversal scene depends only on its frame number, so the
+frames of one scene are split into a segment per worker, each segment is
+rendered by its own manim process, and the PNG sequences are renumbered
+into one sequence, or assembled into a GIF. Run from this folder:
+
+    python render_parallel.py -a --format png --fps 24 -r 1920,1080
+    python render_parallel.py SpeedVariation --format gif --quality l
+
+With --check, each scene is also rendered serially, and the frame count
+and the first and last frame of every segment are compared with it. The
+frame range handling lives in traversal.scene, which imports manim, and
+only the manim release pinned in conda_environment.yml is accepted.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from manim import __version__ as manim_version
+
+from traversal.scene import FRAME_COUNT, FRAME_RANGE, MANIM_VERSION
+
+SCENE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "explanatory_animations.py")
+
+
+def scene_names() -> List[str]:
+    """Every scene in the scene file, in file order."""
+    with open(SCENE_FILE) as source:
+        return re.findall(r"^class (\w+)\(TraversalScene\):", source.read(),
+                          re.MULTILINE)
+
+
+def manim(scene: str,
+          options: Sequence[str],
+          env: dict,
+          media_dir: Optional[str] = None):
+    command = [
+        sys.executable, "-m", "manim", "render", "--progress_bar", "none",
+        "-v", "WARNING", *options
+    ]
+    if media_dir:
+        command += ["--media_dir", media_dir]
+    subprocess.run(command + [SCENE_FILE, scene],
+                   env={
+                       **os.environ,
+                       **env
+                   },
+                   check=True)
+
+
+def count_frames(scene: str, options: Sequence[str],
+                 scratch: str) -> Tuple[int, float]:
+    """Frames and frame rate of a full render, without drawing anything."""
+    path = os.path.join(scratch, f"{scene}.json")
+    manim(scene, [*options, "--dry_run"], {FRAME_COUNT: path},
+          os.path.join(scratch, "count"))
+    with open(path) as counted:
+        info = json.load(counted)
+    return info["frames"], info["fps"]
+
+
+def segments(frames: int, count: int) -> List[Tuple[int, int]]:
+    """Splits frames into count nearly equal, non-empty ranges."""
+    count = max(1, min(count, frames))
+    bounds = [frames * i // count for i in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def render_segment(scene: str, options: Sequence[str], lo: int, hi: int,
+                   media_dir: str) -> List[str]:
+    """PNG files of frames lo..hi, in frame order."""
+    manim(scene, [*options, "--format", "png"], {FRAME_RANGE: f"{lo}:{hi}"},
+          media_dir)
+    images = rendered_images(scene, media_dir)
+    if len(images) != hi - lo:
+        raise RuntimeError(f"{scene} frames {lo}:{hi} rendered "
+                           f"{len(images)} images")
+    return images
+
+
+def rendered_images(scene: str, media_dir: str) -> List[str]:
+    """PNG files manim wrote for scene under media_dir, in frame order."""
+    images = glob.glob(os.path.join(media_dir, "images", "**", "*.png"),
+                       recursive=True)
+    numbered = sorted(
+        (int(match.group(1)), path) for path in images
+        if (match := re.fullmatch(rf"{scene}(\d+)\.png",
+                                  os.path.basename(path))))
+    return [path for _, path in numbered]
+
+
+def render(scene: str, options: Sequence[str], workers: int,
+           output_dir: str, gif: bool) -> str:
+    """Renders scene in parallel segments and returns the output path."""
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=output_dir) as scratch:
+        frames, fps = count_frames(scene, options, scratch)
+        ranges = segments(frames, workers)
+        with ThreadPoolExecutor(len(ranges)) as pool:
+            # Each thread only waits on its own manim process
+            parts = list(
+                pool.map(
+                    lambda item: render_segment(
+                        scene, options, *item[1],
+                        os.path.join(scratch, f"segment{item[0]}")),
+                    enumerate(ranges)))
+        images = [path for part in parts for path in part]
+        if gif:
+            output = os.path.join(output_dir, f"{scene}.gif")
+            write_gif(images, output, fps)
+        else:
+            output = os.path.join(output_dir, scene)
+            for frame, path in enumerate(images):
+                shutil.move(path, f"{output}{frame:04d}.png")
+    return output
+
+
+def check(scene: str, options: Sequence[str], workers: int,
+          output_dir: str) -> List[str]:
+    """Renders scene serially and in segments, and lists any differences.
+
+    Compares the frame counts, and the first and last frame of every
+    segment with the same frames of the serial render, pixel for pixel.
+    """
+    from PIL import Image
+    os.makedirs(output_dir, exist_ok=True)
+    problems = []
+    with tempfile.TemporaryDirectory(dir=output_dir) as scratch:
+        serial = os.path.join(scratch, "serial")
+        manim(scene, [*options, "--format", "png"], {}, serial)
+        full = rendered_images(scene, serial)
+        frames, _ = count_frames(scene, options, scratch)
+        if len(full) != frames:
+            problems.append(f"serial render has {len(full)} frames, the "
+                            f"dry run counted {frames}")
+        output = render(scene, options, workers,
+                        os.path.join(scratch, "parallel"), False)
+        joined = []
+        while os.path.exists(path := f"{output}{len(joined):04d}.png"):
+            joined.append(path)
+        if len(joined) != len(full):
+            problems.append(f"parallel render has {len(joined)} frames, the "
+                            f"serial render {len(full)}")
+        for lo, hi in segments(min(len(full), len(joined)), workers):
+            for frame in sorted({lo, hi - 1}):
+                with Image.open(full[frame]) as a, Image.open(
+                        joined[frame]) as b:
+                    if a.size != b.size or a.tobytes() != b.tobytes():
+                        problems.append(f"frame {frame} differs")
+    return problems
+
+
+def write_gif(images: Sequence[str], output: str, fps: float):
+    from PIL import Image
+    frames = [Image.open(path) for path in images]
+    frames[0].save(output,
+                   save_all=True,
+                   append_images=frames[1:],
+                   duration=1000 / fps,
+                   loop=0,
+                   disposal=1)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names")
+    parser.add_argument("-a",
+                        "--all",
+                        action="store_true",
+                        help="render every scene in the file")
+    parser.add_argument("--format", choices=("png", "gif"), default="png")
+    parser.add_argument("--workers",
+                        type=int,
+                        default=os.cpu_count(),
+                        help="segments rendered at once, default one per "
+                        "core")
+    parser.add_argument("--fps")
+    parser.add_argument("-r", "--resolution")
+    parser.add_argument("-q", "--quality")
+    parser.add_argument("--check",
+                        action="store_true",
+                        help="also render serially and compare the frame "
+                        "count and each segment's first and last frame")
+    parser.add_argument("-o",
+                        "--output-dir",
+                        default=os.path.join("media", "parallel"),
+                        help="where the frames or GIFs are written")
+    args = parser.parse_args(argv)
+
+    if manim_version.split(".")[:2] != MANIM_VERSION.split("."):
+        parser.error(f"manim {manim_version} is installed, but the scenes "
+                     f"need manim {MANIM_VERSION}, as pinned in "
+                     "conda_environment.yml")
+    names = scene_names() if args.all else args.scenes
+    if not names:
+        parser.error("give scene names or -a")
+    options = []
+    for flag, value in (("--fps", args.fps), ("-r", args.resolution),
+                        ("-q", args.quality)):
+        if value:
+            options += [flag, value]
+    if args.check:
+        failed = False
+        for scene in names:
+            problems = check(scene, options, args.workers, args.output_dir)
+            failed = failed or bool(problems)
+            print(f"{scene}: " + ("; ".join(problems) or "segments match"))
+        sys.exit(1 if failed else 0)
+    for scene in names:
+        start = time.perf_counter()
+        output = render(scene, options, args.workers, args.output_dir,
+                        args.format == "gif")
+        print(f"{scene}: {output} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""Makes the traversal package importable when pytest runs from anywhere."""
+import os
+import sys
+
+MANIM = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_SCENE = os.path.join(os.path.dirname(MANIM), "oscillate-demo.ma")
+
+if MANIM not in sys.path:
+    sys.path.insert(0, MANIM)
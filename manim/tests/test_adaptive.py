@@ -0,0 +1,48 @@
+"""Adaptive integration and the tables cumulative_integral shares."""
+import numpy as np
+import pytest
+
+from traversal.adaptive import AdaptiveIntegral, adaptive_integrate
+from traversal.cumulative import cumulative_integral
+from traversal.linear import PiecewiseLinear
+
+
+def _rate(t):
+    return 3 + 2 * np.sin(t) + np.sin(7 * t)
+
+
+def _exact(t):
+    return 3 * t + 2 * (1 - np.cos(t)) + (1 - np.cos(7 * t)) / 7
+
+
+@pytest.mark.parametrize("atol, rtol", [(0, 0), (-1e-6, 0), (0, -1),
+                                        (np.nan, 1e-6)])
+def test_tolerance_must_be_positive(atol, rtol):
+    with pytest.raises(ValueError):
+        AdaptiveIntegral(_rate, atol=atol, rtol=rtol)
+    with pytest.raises(ValueError):
+        adaptive_integrate(_rate, 0, 1, atol=atol, rtol=rtol)
+    cumulative_integral.cache_clear()
+    with pytest.raises(ValueError):
+        cumulative_integral(_rate, atol=atol, rtol=rtol)
+
+
+def test_extensions_add_up_to_the_reported_error():
+    grown = AdaptiveIntegral(_rate, atol=1e-6)
+    passes = 1
+    for end in 2.0**np.arange(1, 8):
+        grown(end)
+        passes += 1
+    whole = AdaptiveIntegral(_rate, end=128, atol=1e-6)
+    t = np.linspace(-1, 128, 2001)
+    assert whole.error <= 1e-6
+    assert grown.error <= passes * 1e-6
+    assert np.abs(grown(t) - _exact(t)).max() <= grown.error + 1e-12
+    assert np.abs(whole(t) - _exact(t)).max() <= whole.error + 1e-12
+
+
+def test_edited_curves_are_integrated_live():
+    curve = PiecewiseLinear([0, 10], [1, 3])
+    assert cumulative_integral(curve, atol=1e-9)(20) == pytest.approx(50)
+    curve.set_key(1, 5)
+    assert cumulative_integral(curve, atol=1e-9)(20) == pytest.approx(80)
@@ -0,0 +1,48 @@
+"""The on-disk integral cache behind cumulative_integral."""
+import numpy as np
+
+from traversal.cache import fingerprint
+from traversal.cumulative import (CACHED_SPAN, CumulativeIntegral,
+                                  cumulative_integral)
+from traversal.noise import GradientNoise
+
+
+def _rate(t):
+    return 2 + np.sin(t)
+
+
+def test_cumulative_integral_maps_tables_from_the_cache(tmp_path,
+                                                        monkeypatch):
+    monkeypatch.setenv("TRAVERSAL_CACHE_DIR", str(tmp_path))
+    cumulative_integral.cache_clear()
+    try:
+        first = cumulative_integral(_rate)
+        assert len(list(tmp_path.glob("*.npy"))) == 1
+        cumulative_integral.cache_clear()
+        second = cumulative_integral(_rate)
+    finally:
+        cumulative_integral.cache_clear()
+    assert not second._values.flags.writeable
+    assert second.range == (0, CACHED_SPAN)
+    t = np.linspace(-5, 2 * CACHED_SPAN, 101)
+    expected = CumulativeIntegral(_rate)(t)
+    np.testing.assert_allclose(first(t), expected, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(second(t), expected, rtol=0, atol=1e-9)
+
+
+def test_cache_stays_off_without_a_directory(monkeypatch):
+    monkeypatch.delenv("TRAVERSAL_CACHE_DIR", raising=False)
+    cumulative_integral.cache_clear()
+    try:
+        assert cumulative_integral(_rate).range == (0, 0)
+    finally:
+        cumulative_integral.cache_clear()
+
+
+def test_noise_fingerprint_ignores_gradients_built_on_demand():
+    noise = GradientNoise(seed=3)
+    before = fingerprint(noise)
+    noise(np.array([0.5, 300.5, 2e6 + 0.5]))
+    assert fingerprint(noise) == before
+    assert fingerprint(GradientNoise(seed=3, table_size=4)) == before
+    assert fingerprint(GradientNoise(seed=4)) != before
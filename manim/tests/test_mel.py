@@ -0,0 +1,131 @@
+"""Parity of the vectorized oscillate.mel evaluator with the MEL loop.
+
+The fixed numbers are for the frequency curve of oscillate-demo.ma, which
+is 3 until frame 47, 15 from frame 160 to 201 and 0.7 after frame 407, so
+most of them can be checked by hand from the keys.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from conftest import DEMO_SCENE
+from traversal.maya_ascii import read_controller
+from traversal.mel import oscillate, riemann, riemann_loop
+
+
+@pytest.fixture(scope="module")
+def controller():
+    return read_controller(DEMO_SCENE)
+
+
+@pytest.fixture(scope="module")
+def frequency(controller):
+    return controller["frequency"]
+
+
+def loop_oscillate(frames, frequency, amplitude=1, center=0, phase=0,
+                   time_offset=0, fps=24):
+    return np.array([
+        center + amplitude * math.sin(
+            riemann_loop(frequency, frame + time_offset) / fps + phase)
+        for frame in frames
+    ])
+
+
+@pytest.mark.parametrize("frames", [
+    np.arange(0, 449),
+    np.arange(-60, 1),
+    np.arange(-30.75, 450, 2.5),
+    np.array([0.5, -0.5, 46.999, 47.001, 159.25, 406.5, 407.5]),
+])
+def test_riemann_matches_loop(frequency, frames):
+    expected = [riemann_loop(frequency, frame) for frame in frames]
+    np.testing.assert_array_equal(riemann(frequency, frames), expected)
+
+
+@pytest.mark.parametrize("step", [0.5, 0.1, 3])
+def test_riemann_matches_loop_at_other_steps(frequency, step):
+    frames = np.array([-20.3, -3, 0, 1.05, 12, 48.7, 200])
+    expected = [riemann_loop(frequency, frame, step) for frame in frames]
+    np.testing.assert_allclose(riemann(frequency, frames, step), expected,
+                               rtol=1e-12, atol=1e-9)
+
+
+def test_riemann_of_constant_rate():
+    frames = np.array([-7.5, -1, 0, 0.25, 9])
+    expected = [riemann_loop(2.5, frame) for frame in frames]
+    np.testing.assert_array_equal(riemann(2.5, frames), expected)
+    np.testing.assert_array_equal(expected, [-20, -2.5, 0, 2.5, 22.5])
+
+
+def test_riemann_scalar_frame(frequency):
+    assert isinstance(riemann(frequency, 24), float)
+    assert riemann(frequency, 24) == riemann_loop(frequency, 24)
+
+
+def test_riemann_rejects_bad_step(frequency):
+    with pytest.raises(ValueError):
+        riemann(frequency, [1, 2], step=0)
+
+
+@pytest.mark.parametrize("frame, expected", [
+    (24, 72),
+    (47, 141),
+    (10.5, 33),
+    (-10, -30),
+    (-5.5, -18),
+    (-2.5, -9),
+    (100, 404.39166759650914),
+    (160, 1152),
+    (201, 1767),
+    (300, 3006.9566378427553),
+    (407, 3391.25),
+    (448, 3419.95),
+])
+def test_riemann_demo_reference_values(frequency, frame, expected):
+    assert riemann(frequency, frame) == pytest.approx(expected, abs=1e-9)
+    assert riemann_loop(frequency, frame) == pytest.approx(expected,
+                                                           abs=1e-9)
+
+
+def test_riemann_demo_held_segments(frequency):
+    # 41 frames at 15 and 41 frames at 0.7 past the last key
+    assert riemann(frequency, 201) - riemann(frequency, 160) == (
+        pytest.approx(41 * 15))
+    assert riemann(frequency, 448) - riemann(frequency, 407) == (
+        pytest.approx(41 * 0.7))
+
+
+def test_oscillate_demo_reference_values(controller):
+    values = oscillate([24, -10, 10.5, 100, 300, 448],
+                       controller["frequency"],
+                       amplitude=controller["amplitude"],
+                       center=controller["oscillationCenter"],
+                       phase=controller["phase"],
+                       time_offset=controller["timeOffset"])
+    np.testing.assert_allclose(values, [
+        5 * math.sin(3), 5 * math.sin(-1.25), 5 * math.sin(33 / 24),
+        -4.546688725487562, -1.8259934849691115, -4.51402339638088
+    ],
+                               atol=1e-12)
+
+
+@pytest.mark.parametrize("time_offset", [0, 5, -12, 2.5, -0.25])
+def test_oscillate_matches_loop(frequency, time_offset):
+    frames = np.arange(-24, 449, 3.5)
+    settings = dict(amplitude=2.5, center=-1, phase=0.3,
+                    time_offset=time_offset)
+    np.testing.assert_array_equal(
+        oscillate(frames, frequency, **settings),
+        loop_oscillate(frames, frequency, **settings))
+
+
+def test_oscillate_time_offset_shifts_frames(frequency):
+    frames = np.arange(-30, 100)
+    np.testing.assert_array_equal(
+        oscillate(frames, frequency, time_offset=7),
+        oscillate(frames + 7, frequency))
+    # timeOffset 24 at frame 0 reads frame 24's riemann sum: 72 / 24
+    assert oscillate(0, frequency, time_offset=24) == pytest.approx(
+        math.sin(3))
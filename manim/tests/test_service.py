@@ -0,0 +1,235 @@
+import asyncio
+import json
+import math
+
+import numpy as np
+import pytest
+
+from conftest import DEMO_SCENE
+from traversal.bake import bake
+from traversal.linear import PiecewiseLinear
+from traversal.maya_ascii import read_scene
+from traversal.service import PreviewClient, PreviewService
+
+CURVE = "oscillation_controller_frequency"
+
+
+def demo_curves():
+    scene = read_scene(DEMO_SCENE)
+    return {
+        name: node.to_curve(scene.fps)
+        for name, node in scene.curves.items()
+    }
+
+
+def run(session, curves=None):
+    """Runs session(service, client) against a service on a free port."""
+
+    async def main():
+        service = PreviewService(curves)
+        host, port = await service.start()
+        client = await PreviewClient.connect(host, port)
+        try:
+            return await asyncio.wait_for(session(service, client), 10)
+        finally:
+            await client.close()
+            await service.close()
+
+    return asyncio.run(main())
+
+
+def test_load_scene_curves():
+
+    async def session(service, client):
+        return await client.request("curves")
+
+    assert run(session, demo_curves()) == [CURVE]
+
+
+def test_register_and_integral():
+
+    async def session(service, client):
+        await client.register("ramp", [0, 10], [1, 3], linear=True)
+        return (await client.request("curves"), await client.integral(
+            "ramp", [0, 5, 10, 20]))
+
+    names, integral = run(session)
+    assert names == ["ramp"]
+    np.testing.assert_allclose(integral, [0, 7.5, 20, 50])
+
+
+def test_values_match_bake():
+    curves = demo_curves()
+    frames = np.arange(-24, 449)
+
+    async def session(service, client):
+        return await client.values(CURVE,
+                                   frames,
+                                   amplitude=2,
+                                   center=1,
+                                   phase=0.5,
+                                   time_offset=3)
+
+    expected = bake(demo_curves()[CURVE],
+                    frames,
+                    amplitude=2,
+                    center=1,
+                    phase=0.5,
+                    time_offset=3)
+    np.testing.assert_allclose(run(session, curves), expected, atol=1e-12)
+
+
+def test_edit_updates_values():
+
+    async def session(service, client):
+        await client.register("ramp", [0, 10, 20], [1, 1, 1], linear=True)
+        edit = await client.edit("ramp", 1, value=3)
+        return edit, await client.integral("ramp", [0, 10, 20, 30])
+
+    edit, integral = run(session)
+    assert (edit.start, edit.end) == (0, 20)
+    assert edit.before == 0 and edit.after == pytest.approx(20)
+    np.testing.assert_allclose(integral, [0, 20, 40, 50])
+
+
+def test_subscribers_get_invalidations():
+
+    async def session(service, client):
+        other = await PreviewClient.connect(*service.server.sockets[0]
+                                            .getsockname()[:2])
+        try:
+            await other.subscribe(CURVE)
+            edit = await client.edit(CURVE, 2, value=9)
+            curve, event = await other.invalidations.get()
+            await other.unsubscribe(CURVE)
+            await client.edit(CURVE, 2, value=15)
+            await client.request("curves")
+            return edit, curve, event, other.invalidations.qsize()
+        finally:
+            await other.close()
+
+    edit, curve, event, pending = run(session, demo_curves())
+    assert curve == CURVE
+    assert event == edit
+    assert pending == 0
+
+
+def test_reregister_invalidates_everything():
+
+    async def session(service, client):
+        await client.register("ramp", [0, 10], [1, 3], linear=True)
+        await client.subscribe("ramp")
+        await client.register("ramp", [0, 10], [2, 2], linear=True)
+        return await client.invalidations.get()
+
+    curve, event = run(session)
+    assert curve == "ramp"
+    assert (event.start, event.end) == (-math.inf, math.inf)
+
+
+@pytest.mark.parametrize("value", [None, math.nan, math.inf])
+def test_edit_rejects_missing_or_non_finite_value(value):
+
+    async def session(service, client):
+        await client.register("ramp", [0, 10], [1, 3], linear=True)
+        await client.subscribe("ramp")
+        with pytest.raises(ValueError, match="value"):
+            await client.edit("ramp", 1, value=value)
+        return (await client.integral("ramp", [10]),
+                client.invalidations.qsize())
+
+    integral, pending = run(session)
+    np.testing.assert_allclose(integral, [20])
+    assert pending == 0
+
+
+def test_missing_value_raw_request_gets_error_reply():
+
+    async def session(service, client):
+        await client.register("ramp", [0, 10], [1, 3], linear=True)
+        host, port = service.server.sockets[0].getsockname()[:2]
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b'{"id": 7, "op": "edit", "curve": "ramp", '
+                     b'"index": 1}\n')
+        line = await reader.readline()
+        writer.close()
+        await writer.wait_closed()
+        return line
+
+    reply = json.loads(run(session))
+    assert reply["id"] == 7
+    assert reply["error"].startswith("ValueError")
+    assert "result" not in reply
+
+
+def test_unknown_curve_is_an_error():
+
+    async def session(service, client):
+        with pytest.raises(ValueError, match="unknown curve"):
+            await client.values("missing", [1, 2])
+        return await client.request("curves")
+
+    assert run(session) == []
+
+
+@pytest.mark.parametrize("frames, message", [
+    ([1, math.inf], "finite"),
+    ([1, math.nan], "finite"),
+    ([1, 1e300], "within"),
+])
+def test_bad_frames_are_errors(frames, message):
+
+    async def session(service, client):
+        await client.register("ramp", [0, 10], [1, 3], linear=True)
+        for op in ("integral", "values"):
+            with pytest.raises(ValueError, match=message):
+                await client.request(op,
+                                     curve="ramp",
+                                     frames=frames,
+                                     target="noise")
+        return await client.integral("ramp", [10])
+
+    np.testing.assert_allclose(run(session), [20])
+
+
+def test_bad_registrations_are_errors():
+
+    async def session(service, client):
+        for times, values in (([0, math.inf], [1, 2]),
+                              ([0, 1], [1, math.nan]), ([0, 1e300], [1, 2])):
+            with pytest.raises(ValueError):
+                await client.request("register",
+                                     curve="bad",
+                                     times=times,
+                                     values=values)
+        with pytest.raises(ValueError, match="divisor"):
+            await client.values(CURVE, [1], divisor=0)
+        return await client.request("curves")
+
+    assert run(session, demo_curves()) == [CURVE]
+
+
+def test_unexpected_errors_keep_pipelined_requests():
+
+    class Broken(PiecewiseLinear):
+        broken = False
+
+        def integral(self, t):
+            if self.broken:
+                raise OverflowError("too far")
+            return super().integral(t)
+
+    async def session(service, client):
+        curve = Broken([0, 1], [1, 1])
+        curve.broken = True
+        service.register("broken", curve)
+        replies = await asyncio.gather(
+            client.integral("broken", [1]),
+            client.integral("ramp", [10]),
+            return_exceptions=True)
+        return replies
+
+    broken, ramp = run(session, {"ramp": PiecewiseLinear([0, 10], [1, 3])})
+    assert isinstance(broken, ValueError)
+    assert "OverflowError" in str(broken)
+    np.testing.assert_allclose(ramp, [20])
@@ -0,0 +1,70 @@
+"""Numerical tools for variable rate function traversal, f(t) = g(Ω(t)).
+
+The package only needs NumPy. Names are imported from their submodules on
+first use, so `import traversal` stays cheap for short-lived bake tasks.
+"""
+import importlib
+
+_EXPORTS = {
+    "AdaptiveIntegral": "adaptive",
+    "AnimCurve": "curves",
+    "BatchEngine": "batch",
+    "Chain": "chain",
+    "Clip": "clips",
+    "CompiledChain": "chain",
+    "CumulativeIntegral": "cumulative",
+    "GradientNoise": "noise",
+    "IntegralCache": "cache",
+    "IntegralEdit": "edits",
+    "InverseIndex": "inverse",
+    "PiecewiseLinear": "linear",
+    "QuadratureResult": "adaptive",
+    "TraversalClock": "clock",
+    "adaptive_integrate": "adaptive",
+    "cumulative_integral": "cumulative",
+    "parallel_integral": "parallel",
+    "retime": "clips",
+    "retime_file": "clips",
+    "sample": "sampling",
+    "stream": "clock",
+    "traverse": "cumulative",
+}
+
+__all__ = [
+    "AdaptiveIntegral",
+    "AnimCurve",
+    "BatchEngine",
+    "Chain",
+    "Clip",
+    "CompiledChain",
+    "CumulativeIntegral",
+    "GradientNoise",
+    "IntegralCache",
+    "IntegralEdit",
+    "InverseIndex",
+    "PiecewiseLinear",
+    "QuadratureResult",
+    "TraversalClock",
+    "adaptive_integrate",
+    "cumulative_integral",
+    "parallel_integral",
+    "retime",
+    "retime_file",
+    "sample",
+    "stream",
+    "traverse",
+]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
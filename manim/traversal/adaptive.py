@@ -0,0 +1,233 @@
+"""Error-controlled adaptive integration of rate functions."""
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from . import instrument
+from .sampling import sample
+
+
+class QuadratureResult(NamedTuple):
+    value: float
+    error: float
+    evaluations: int
+
+
+class _Cells(NamedTuple):
+    """Accepted Simpson cells, each with its left edge, width and samples."""
+    left: np.ndarray
+    width: np.ndarray
+    f0: np.ndarray
+    fm: np.ndarray
+    f1: np.ndarray
+    error: float
+    evaluations: int
+
+
+def _simpson(width, f0, fm, f1):
+    return width * (f0 + 4 * fm + f1) / 6
+
+
+def _check_tolerance(atol: float, rtol: float):
+    # With neither positive every cell would split down to max_depth
+    if not (atol >= 0 and rtol >= 0 and atol + rtol > 0):
+        raise ValueError("atol and rtol must be non-negative, and one of "
+                         "them positive")
+
+
+def _adaptive_cells(func: Callable,
+                    a: float,
+                    b: float,
+                    atol: float,
+                    rtol: float,
+                    min_depth: int,
+                    max_depth: int,
+                    interpolated: bool = False) -> _Cells:
+    """Splits [a, b] into Simpson cells until each meets its error share.
+
+    All panels of one refinement level are evaluated in a single call to
+    func, so flat stretches stop splitting early and only the panels where
+    omega changes, such as the ramp of omega_func, keep being refined.
+    With `interpolated` set, cells must also be accurate at their midpoint,
+    for tables that are looked up inside a cell.
+    """
+    ends = sample(func, [a, (a + b) / 2, b])
+    evaluations = 3
+    left = np.array([a])
+    width = np.array([b - a])
+    f0, fm, f1 = ends[:1], ends[1:2], ends[2:]
+    whole = _simpson(width, f0, fm, f1)
+    estimate = float(whole[0])
+    done = []
+    error = 0.0
+    for depth in range(max_depth + 1):
+        half = width / 2
+        quarters = sample(
+            func, np.concatenate((left + half / 2, left + 3 * half / 2)))
+        evaluations += len(quarters)
+        fl, fr = np.split(quarters, 2)
+        first = _simpson(half, f0, fl, fm)
+        second = _simpson(half, fm, fr, f1)
+        diff = (first + second - whole) / 15
+        tol = max(atol, rtol * abs(estimate)) * width / (b - a)
+        accurate = np.abs(diff) <= tol
+        if interpolated:
+            # The coarse quadratic must match the refined integral at the
+            # midpoint as well
+            drift = first - width * (5 * f0 + 8 * fm - f1) / 24
+            accurate &= np.abs(drift) <= tol
+        accept = (accurate & (depth >= min_depth)) | (depth == max_depth)
+        estimate += float(np.sum(diff * 16))
+        error += float(np.sum(np.abs(diff[accept])))
+        kept = half[accept]
+        done.append((np.concatenate((left[accept], left[accept] + kept)),
+                     np.concatenate((kept, kept)),
+                     np.concatenate((f0[accept], fm[accept])),
+                     np.concatenate((fl[accept], fr[accept])),
+                     np.concatenate((fm[accept], f1[accept]))))
+        split = ~accept
+        if not split.any():
+            break
+        left = np.concatenate((left[split], left[split] + half[split]))
+        width = np.concatenate((half[split], half[split]))
+        f0, fm, f1 = (np.concatenate((f0[split], fm[split])),
+                      np.concatenate((fl[split], fr[split])),
+                      np.concatenate((fm[split], f1[split])))
+        whole = np.concatenate((first[split], second[split]))
+    parts = [np.concatenate(column) for column in zip(*done)]
+    order = np.argsort(parts[0], kind="stable")
+    return _Cells(*(part[order] for part in parts), error, evaluations)
+
+
+def adaptive_integrate(func: Callable[[float], float],
+                       a: float,
+                       b: float,
+                       atol: float = 1e-8,
+                       rtol: float = 0,
+                       min_depth: int = 2,
+                       max_depth: int = 30) -> QuadratureResult:
+    """Integral of func from a to b to within max(atol, rtol * |value|).
+
+    Returns the value together with the estimated error and the number of
+    times func was evaluated.
+    """
+    _check_tolerance(atol, rtol)
+    if a == b:
+        return QuadratureResult(0.0, 0.0, 0)
+    if b < a:
+        value, error, evaluations = adaptive_integrate(func, b, a, atol, rtol,
+                                                       min_depth, max_depth)
+        return QuadratureResult(-value, error, evaluations)
+    cells = _adaptive_cells(func, a, b, atol, rtol, min_depth, max_depth)
+    value = float(np.sum(_simpson(cells.width, cells.f0, cells.fm, cells.f1)))
+    return QuadratureResult(value, cells.error, cells.evaluations)
+
+
+class AdaptiveIntegral:
+    """Cumulative integral of omega on an adaptively refined mesh.
+
+    Works like `CumulativeIntegral` but with a tolerance instead of a fixed
+    step: cells are only subdivided where omega changes, and within a cell
+    the integral of the Simpson quadratic is evaluated exactly. The achieved
+    error estimate and the number of omega evaluations are kept in `error`
+    and `evaluations`. Queries outside the built span extend it with another
+    adaptive pass over the new stretch. The tolerance applies to each pass
+    on its own, so errors add up across extensions: a mesh extended n
+    times may be off by up to n + 1 times the tolerance, and `error` holds
+    the sum. Extensions at least double the span, so n stays below
+    log2 of the span over the initial one; build the whole span up front
+    with `start` and `end` to hold all of it to one tolerance.
+    """
+
+    def __init__(self,
+                 func: Callable[[float], float],
+                 start: float = 0,
+                 end: float = 1,
+                 atol: float = 1e-8,
+                 rtol: float = 0,
+                 min_depth: int = 2,
+                 max_depth: int = 30):
+        _check_tolerance(atol, rtol)
+        self.func = func
+        self.atol = atol
+        self.rtol = rtol
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.error = 0.0
+        self.evaluations = 0
+        self._left = np.zeros(0)
+        self._width = np.zeros(0)
+        self._coefficients = np.zeros((3, 0))
+        self._values = np.zeros(1)
+        self._origin = 0.0
+        lo, hi = min(start, 0), max(end, 0)
+        if hi == lo:
+            hi = lo + 1
+        self._append(self._build(lo, hi))
+        self._origin = self(0.0)
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        if instrument.ENABLED:
+            instrument.count_call("integral", self, t.size)
+        if t.size:
+            self._ensure(float(t.min()), float(t.max()))
+        i = np.clip(
+            np.searchsorted(self._left, t, side="right") - 1, 0,
+            len(self._left) - 1)
+        s = t - self._left[i]
+        f0, b, c = self._coefficients[:, i]
+        result = self._values[i] + s * (f0 + s * (b / 2 + s * c / 3))
+        result = result - self._origin
+        return result if result.ndim else float(result)
+
+    @property
+    def range(self) -> tuple[float, float]:
+        """Span of t currently covered by the mesh."""
+        return self._left[0], self._left[-1] + self._width[-1]
+
+    def _build(self, a: float, b: float) -> _Cells:
+        cells = _adaptive_cells(self.func,
+                                a,
+                                b,
+                                self.atol,
+                                self.rtol,
+                                self.min_depth,
+                                self.max_depth,
+                                interpolated=True)
+        self.error += cells.error
+        self.evaluations += cells.evaluations
+        return cells
+
+    def _append(self, cells: _Cells, before: bool = False):
+        h = cells.width
+        # Quadratic through (0, f0), (h / 2, fm), (h, f1): f0 + b s + c s^2
+        coefficients = np.array((cells.f0,
+                                 (4 * cells.fm - 3 * cells.f0 - cells.f1) / h,
+                                 2 * (cells.f0 - 2 * cells.fm + cells.f1) /
+                                 h**2))
+        areas = np.cumsum(_simpson(h, cells.f0, cells.fm, cells.f1))
+        if before:
+            values = self._values[0] - areas[-1] + np.concatenate(
+                ([0], areas))
+            self._values = np.concatenate((values, self._values[1:]))
+            self._left = np.concatenate((cells.left, self._left))
+            self._width = np.concatenate((h, self._width))
+            self._coefficients = np.concatenate(
+                (coefficients, self._coefficients), axis=1)
+        else:
+            self._values = np.concatenate(
+                (self._values, self._values[-1] + areas))
+            self._left = np.concatenate((self._left, cells.left))
+            self._width = np.concatenate((self._width, h))
+            self._coefficients = np.concatenate(
+                (self._coefficients, coefficients), axis=1)
+
+    def _ensure(self, lo: float, hi: float):
+        start, end = self.range
+        span = end - start
+        if hi > end:
+            self._append(self._build(end, max(hi, end + span)))
+        if lo < start:
+            self._append(self._build(min(lo, start - span), start),
+                         before=True)
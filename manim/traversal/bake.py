@@ -0,0 +1,327 @@
+"""Offline bake of a traversal into reduced-key output curves.
+
+Example, baking the cube in the demo scene over its playback range:
+
+    python -m traversal.bake ../oscillate-demo.ma --end 448 -o cube.ma
+
+The command line bakes oscillate.mel's own left Riemann sum by default, so
+the curve can replace the expression without changing the animation.
+`--exact` bakes the exact integral instead, which fixes the expression's
+drift but no longer matches it.
+"""
+import argparse
+import os
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from .cumulative import cumulative_integral
+from .curves import Rate, as_rate
+from .linear import PiecewiseLinear
+from .maya_ascii import FIXED, LINEAR
+from .mel import riemann as riemann_sum
+from .noise import GradientNoise
+from .sampling import sample
+
+
+TARGETS = {
+    "sin": lambda seed: np.sin,
+    "noise": lambda seed: GradientNoise(seed=seed),
+}
+
+
+def bake(frequency: Rate,
+         frames,
+         amplitude: float = 1,
+         center: float = 0,
+         phase: float = 0,
+         time_offset: float = 0,
+         divisor: float = 24,
+         target: Callable = np.sin,
+         riemann: bool = False) -> np.ndarray:
+    """Output of the oscillate expression at every frame, in one pass.
+
+    Evaluates center + amplitude * g(Ω(frame + time_offset) / divisor +
+    phase), where Ω integrates frequency over frames, like cube.translateY
+    in the demo scene, whose expression divides by 24 whatever the scene's
+    frame rate. With `riemann` set, Ω is the expression's own left sum at a
+    step of one frame, so the bake reproduces Maya's numbers exactly.
+    """
+    phases = _phases(frequency, frames, time_offset, divisor, riemann)
+    return center + amplitude * sample(target, phases + phase)
+
+
+def bake_slopes(frequency: Rate,
+                frames,
+                amplitude: float = 1,
+                phase: float = 0,
+                time_offset: float = 0,
+                divisor: float = 24,
+                target: Callable = np.sin,
+                riemann: bool = False) -> np.ndarray:
+    """Derivative per frame of `bake` at every frame, for key tangents.
+
+    By the chain rule it is amplitude * g'(phase) * ω(frame) / divisor. g'
+    is cos for sin, and a central difference for any other target. The
+    Riemann sum is a step function, so with `riemann` set ω(frame) is
+    replaced by its forward difference over one frame.
+    """
+    phases = _phases(frequency, frames, time_offset, divisor, riemann)
+    phases = phases + phase
+    frames = np.asarray(frames, dtype=float) + time_offset
+    if riemann:
+        frequency = as_rate(frequency)
+        rate = riemann_sum(frequency, frames + 1) - riemann_sum(
+            frequency, frames)
+    else:
+        rate = sample(as_rate(frequency), frames)
+    if target is np.sin:
+        derivative = np.cos(phases)
+    else:
+        h = 1e-5
+        derivative = (sample(target, phases + h) -
+                      sample(target, phases - h)) / (2 * h)
+    return amplitude * derivative * rate / divisor
+
+
+def _phases(frequency: Rate, frames, time_offset: float, divisor: float,
+            riemann: bool) -> np.ndarray:
+    frequency = as_rate(frequency)
+    frames = np.asarray(frames, dtype=float)
+    if riemann:
+        return riemann_sum(frequency, frames + time_offset) / divisor
+    return cumulative_integral(frequency)(frames + time_offset) / divisor
+
+
+def reduce_keys(times, values, tolerance: float, slopes=None) -> np.ndarray:
+    """Indices of keys whose interpolation stays within tolerance.
+
+    Uses Douglas-Peucker on the value error: a span is split at its worst
+    sample until every sample is within tolerance of the interpolation
+    between the span's kept end keys. That is a straight line, or with
+    `slopes` the cubic Hermite segment with those tangents at its ends,
+    which is what an animCurve with fixed tangents plays back.
+    """
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(times) <= 2 or tolerance <= 0:
+        return np.arange(len(times))
+    if slopes is not None:
+        slopes = np.asarray(slopes, dtype=float)
+    keep = np.zeros(len(times), dtype=bool)
+    keep[[0, -1]] = True
+    spans = [(0, len(times) - 1)]
+    while spans:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+        inner = slice(first + 1, last)
+        if slopes is None:
+            curve = np.interp(times[inner], times[[first, last]],
+                              values[[first, last]])
+        else:
+            curve = _hermite(times[inner], times[first], times[last],
+                             values[first], values[last],
+                             slopes[first], slopes[last])
+        errors = np.abs(values[inner] - curve)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            spans.extend(((first, split), (split, last)))
+    return np.flatnonzero(keep)
+
+
+def _hermite(t, t0, t1, y0, y1, m0, m1):
+    h = t1 - t0
+    s = (t - t0) / h
+    return (y0 + s * (m0 * h + s * ((3 * (y1 - y0) - (2 * m0 + m1) * h) + s *
+                                    (2 * (y0 - y1) + (m0 + m1) * h))))
+
+
+def write_csv(path: str, times, values):
+    np.savetxt(path,
+               np.column_stack((times, values)),
+               delimiter=",",
+               header="frame,value",
+               comments="")
+
+
+def write_npy(path: str, times, values):
+    np.save(path, np.column_stack((times, values)))
+
+
+def write_anim_curve(path: str,
+                     times,
+                     values,
+                     node: str = "cube",
+                     attribute: str = "translateY",
+                     curve_type: str = "animCurveTL",
+                     slopes=None,
+                     fps: float = 24):
+    """Writes a Maya ASCII snippet with an animCurve through the keys.
+
+    With `slopes`, in value per frame, every key gets a fixed tangent with
+    that slope, otherwise the tangents are linear. The snippet creates the
+    curve and connects it to node.attribute, and can be imported into a
+    scene once the driving expression has been removed.
+    """
+    name = f"{node}_{attribute}"
+    pairs = [f"{t:.10g} {v:.17g}" for t, v in zip(times, values)]
+    count = len(pairs)
+    with open(path, "w") as out:
+        out.write(f'createNode {curve_type} -n "{name}";\n')
+        out.write(f'\tsetAttr ".tan" {LINEAR if slopes is None else FIXED};\n')
+        out.write('\tsetAttr ".wgt" no;\n')
+        _write_keys(out, "ktv", count, pairs)
+        if slopes is not None:
+            # Unit tangent directions with x in seconds, as Maya stores them
+            slopes = np.asarray(slopes, dtype=float) * fps
+            x = 1 / np.sqrt(1 + slopes**2)
+            types = [str(FIXED)] * count
+            directions = [f"{v:.17g}" for v in x], [
+                f"{v:.17g}" for v in slopes * x
+            ]
+            for side in "io":
+                _write_keys(out, f"k{side}t", count, types)
+                _write_keys(out, f"k{side}x", count, directions[0])
+                _write_keys(out, f"k{side}y", count, directions[1])
+        out.write(f'connectAttr "{name}.o" "{node}.{attribute}";\n')
+
+
+def _write_keys(out, attribute: str, count: int, items):
+    lines = [
+        "\t\t" + " ".join(items[i:i + 4]) for i in range(0, len(items), 4)
+    ]
+    out.write(f'\tsetAttr -s {count} ".{attribute}[0:{count - 1}]"\n')
+    out.write("\n".join(lines) + ";\n")
+
+
+WRITERS = {
+    ".csv": write_csv,
+    ".npy": write_npy,
+    ".ma": write_anim_curve,
+}
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m traversal.bake",
+        description="Bake f(t) = center + amplitude * g(Ω(t) / divisor + "
+        "phase) for a frame range and write it as reduced keys.")
+    parser.add_argument("scene",
+                        nargs="?",
+                        help="Maya ASCII scene with the rate controller")
+    parser.add_argument("--controller", default="oscillation_controller")
+    parser.add_argument("--keys",
+                        help="CSV of frame,frequency keys, used instead of a "
+                        "scene, joined linearly")
+    parser.add_argument("--frequency", type=float, help="constant rate")
+    parser.add_argument("--amplitude", type=float)
+    parser.add_argument("--center", type=float)
+    parser.add_argument("--phase", type=float)
+    parser.add_argument("--time-offset", type=float)
+    parser.add_argument("--target", choices=sorted(TARGETS), default="sin")
+    parser.add_argument("--seed", type=int, default=1, help="noise seed")
+    parser.add_argument("--start", type=float, default=0)
+    parser.add_argument("--end", type=float, required=True)
+    parser.add_argument("--by", type=float, default=1, help="frame step")
+    parser.add_argument("--fps",
+                        type=float,
+                        help="scene frame rate for the tangents, by default "
+                        "the scene's")
+    parser.add_argument("--phase-divisor",
+                        type=float,
+                        default=24,
+                        help="what Ω is divided by, 24 in oscillate.mel")
+    parser.add_argument("--exact",
+                        action="store_true",
+                        help="use the exact integral instead of "
+                        "oscillate.mel's left sum at one frame steps; fixes "
+                        "its drift, so the animation changes")
+    parser.add_argument("--tolerance",
+                        type=float,
+                        default=1e-2,
+                        help="allowed value error of the reduced keys; 0 "
+                        "keeps every frame")
+    parser.add_argument("--node", default="cube")
+    parser.add_argument("--attribute", default="translateY")
+    parser.add_argument("-o",
+                        "--output",
+                        required=True,
+                        help="output file, .csv, .npy or .ma")
+    args = parser.parse_args(argv)
+
+    settings = {
+        "frequency": 1.0,
+        "amplitude": 1.0,
+        "oscillationCenter": 0.0,
+        "phase": 0.0,
+        "timeOffset": 0.0,
+    }
+    fps = 24
+    if args.scene:
+        from .maya_ascii import read_scene
+        scene = read_scene(args.scene, [args.controller])
+        fps = scene.fps
+        for name in settings:
+            settings[name] = scene.attribute(f"{args.controller}.{name}")
+    if args.keys:
+        try:
+            keys = np.loadtxt(args.keys,
+                              delimiter=",",
+                              ndmin=2,
+                              comments="#")
+            if keys.shape[0] < 1 or keys.shape[1] < 2:
+                raise ValueError("expected rows of frame,frequency")
+            settings["frequency"] = PiecewiseLinear(keys[:, 0], keys[:, 1])
+        except (OSError, ValueError) as error:
+            parser.error(f"bad --keys file {args.keys}: {error}")
+    for name, value in (("frequency", args.frequency),
+                        ("amplitude", args.amplitude),
+                        ("oscillationCenter", args.center),
+                        ("phase", args.phase), ("timeOffset",
+                                                args.time_offset)):
+        if value is not None:
+            settings[name] = value
+    for name in ("amplitude", "oscillationCenter", "phase", "timeOffset"):
+        if callable(settings[name]):
+            parser.error(f"animated {name} is not supported by the bake")
+
+    frames = np.arange(args.start, args.end + args.by / 2, args.by)
+    fps = args.fps or fps
+    options = dict(amplitude=settings["amplitude"],
+                   phase=settings["phase"],
+                   time_offset=settings["timeOffset"],
+                   divisor=args.phase_divisor,
+                   target=TARGETS[args.target](args.seed),
+                   riemann=not args.exact)
+    values = bake(settings["frequency"],
+                  frames,
+                  center=settings["oscillationCenter"],
+                  **options)
+
+    extension = os.path.splitext(args.output)[1].lower()
+    if extension not in WRITERS:
+        parser.error(f"unsupported output format {extension!r}")
+    if extension == ".ma":
+        # Fixed tangents from the derivative need far fewer keys than linear
+        # interpolation for the same error
+        slopes = bake_slopes(settings["frequency"], frames, **options)
+        kept = reduce_keys(frames, values, args.tolerance, slopes)
+        write_anim_curve(args.output,
+                         frames[kept],
+                         values[kept],
+                         args.node,
+                         args.attribute,
+                         slopes=slopes[kept],
+                         fps=fps)
+    else:
+        kept = reduce_keys(frames, values, args.tolerance)
+        WRITERS[extension](args.output, frames[kept], values[kept])
+    print(f"baked {len(frames)} frames to {len(kept)} keys "
+          f"({len(kept) / len(frames):.0%}) in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
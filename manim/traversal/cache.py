@@ -0,0 +1,234 @@
+"""On-disk cache of cumulative integral tables, shared between processes.
+
+Tables are stored as .npy files named by a content hash of the rate
+function, the step and the grid range, and are opened memory-mapped, so
+every render and every worker process that asks for the same integral maps
+the same pages instead of sampling omega again. The cache lives in
+$TRAVERSAL_CACHE_DIR, or in traversal/ under the user cache directory.
+Setting TRAVERSAL_CACHE_DIR also makes `cumulative_integral` serve its
+fixed-step tables from the cache.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import types
+from typing import Callable, Optional
+
+import numpy as np
+
+from .cumulative import CumulativeIntegral
+
+
+class IntegralCache:
+    """Directory of memory-mapped integral tables with LRU eviction.
+
+    Files are written atomically, so processes sharing a cache never see a
+    partial table. Each hit refreshes the file's modification time, and
+    after a write the least recently used files are removed until the
+    cache fits in `max_bytes`.
+    """
+
+    def __init__(self,
+                 directory: Optional[str] = None,
+                 max_bytes: int = 1 << 30):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def integral(self,
+                 func: Callable[[float], float],
+                 step: float = 0.01,
+                 start: float = 0,
+                 end: float = 0,
+                 workers: Optional[int] = None) -> CumulativeIntegral:
+        """The table for func over [start, end], from disk when cached.
+
+        Misses are computed, in parallel when `workers` is given, and
+        stored. Functions whose definition can't be hashed are computed
+        without caching. The returned table is read-only until it is
+        edited or grown, which copies it.
+        """
+        first = min(int(np.floor(start / step)), 0)
+        last = max(int(np.ceil(end / step)), 0)
+        key = self.key(func, step, first, last)
+        if key is None:
+            return self._compute(func, step, start, end, workers)
+        path = os.path.join(self.directory, key + ".npy")
+        try:
+            table = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            computed = self._compute(func, step, start, end, workers)
+            try:
+                self._store(path,
+                            np.stack((computed._rates, computed._values)))
+            except OSError:
+                # Read-only shared caches still serve what they hold
+                return computed
+            table = np.load(path, mmap_mode="r")
+        else:
+            try:
+                os.utime(path)
+            except OSError:
+                # A read-only cache can't record the hit for eviction
+                pass
+        return CumulativeIntegral.from_table(func, step, first, *table)
+
+    @staticmethod
+    def key(func: Callable, step: float, first: int,
+            last: int) -> Optional[str]:
+        """Cache key for func on grid indices first..last, or None."""
+        definition = fingerprint(func)
+        if definition is None:
+            return None
+        return hashlib.sha256(
+            f"{definition}:{step!r}:{first}:{last}".encode()).hexdigest()
+
+    def size(self) -> int:
+        """Total bytes of the cached tables."""
+        return sum(os.path.getsize(path) for path in self._entries())
+
+    def clear(self):
+        for path in self._entries():
+            os.remove(path)
+
+    def _compute(self, func, step, start, end, workers):
+        if workers is not None:
+            from .parallel import parallel_integral
+            return parallel_integral(func, step, start, end, workers)
+        return CumulativeIntegral(func, step, start, end)
+
+    def _store(self, path: str, table: np.ndarray):
+        handle, temporary = tempfile.mkstemp(dir=self.directory,
+                                             suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as out:
+                np.save(out, table)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self._evict(keep=path)
+
+    def _entries(self):
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.endswith(".npy")
+        ]
+
+    def _evict(self, keep: str):
+        entries = []
+        for path in self._entries():
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def default_directory() -> str:
+    directory = os.environ.get("TRAVERSAL_CACHE_DIR")
+    if directory:
+        return directory
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "traversal")
+
+
+def fingerprint(func) -> Optional[str]:
+    """Hash of everything that defines a rate function, or None.
+
+    Functions are hashed by their bytecode, constants, defaults, closure
+    cells and the globals they read, recursively, so editing a rate curve
+    in the scene file changes its hash. Other objects are hashed by their
+    attributes, or by their `__getstate__` when their class defines one,
+    which leaves out caches they build lazily, or by their pickle when
+    they have no attributes.
+    """
+    digest = hashlib.sha256()
+    try:
+        _feed(digest, func, set())
+    except _Unhashable:
+        return None
+    return digest.hexdigest()
+
+
+class _Unhashable(Exception):
+    pass
+
+
+def _feed(digest, obj, seen: set):
+    if obj is None or isinstance(obj, (bool, int, float, complex, str,
+                                       bytes)):
+        digest.update(repr((type(obj).__name__, obj)).encode())
+        return
+    if isinstance(obj, np.generic):
+        obj = np.asarray(obj)
+    if isinstance(obj, np.ndarray):
+        digest.update(f"ndarray:{obj.dtype.str}:{obj.shape}".encode())
+        digest.update(np.ascontiguousarray(obj).tobytes())
+        return
+    if isinstance(obj, (types.ModuleType, types.BuiltinFunctionType,
+                        np.ufunc, type)):
+        name = getattr(obj, "__qualname__", None) or obj.__name__
+        digest.update(f"{getattr(obj, '__module__', '')}.{name}".encode())
+        return
+    if id(obj) in seen:
+        digest.update(b"<seen>")
+        return
+    seen.add(id(obj))
+    if isinstance(obj, (tuple, list)):
+        digest.update(f"{type(obj).__name__}:{len(obj)}".encode())
+        for item in obj:
+            _feed(digest, item, seen)
+    elif isinstance(obj, dict):
+        digest.update(f"dict:{len(obj)}".encode())
+        for name in sorted(obj, key=repr):
+            _feed(digest, name, seen)
+            _feed(digest, obj[name], seen)
+    elif isinstance(obj, types.FunctionType):
+        _feed_code(digest, obj.__code__, obj.__globals__, seen)
+        _feed(digest, (obj.__defaults__, obj.__kwdefaults__), seen)
+        for cell in obj.__closure__ or ():
+            _feed(digest, cell.cell_contents, seen)
+    elif isinstance(obj, types.MethodType):
+        _feed(digest, (obj.__func__, obj.__self__), seen)
+    elif isinstance(obj, functools.partial):
+        _feed(digest, (obj.func, obj.args, obj.keywords), seen)
+    elif hasattr(obj, "__dict__"):
+        _feed(digest, type(obj), seen)
+        getstate = getattr(type(obj), "__getstate__", None)
+        if getstate is not getattr(object, "__getstate__", None):
+            _feed(digest, obj.__getstate__(), seen)
+        else:
+            _feed(digest, vars(obj), seen)
+    else:
+        try:
+            digest.update(pickle.dumps(obj))
+        except Exception as error:
+            raise _Unhashable from error
+
+
+def _feed_code(digest, code: types.CodeType, namespace: dict, seen: set):
+    digest.update(code.co_code)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            _feed_code(digest, constant, namespace, seen)
+        else:
+            _feed(digest, constant, seen)
+    for name in code.co_names:
+        digest.update(name.encode())
+        if name in namespace:
+            _feed(digest, namespace[name], seen)
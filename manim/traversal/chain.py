@@ -0,0 +1,198 @@
+"""Chains of nested traversals and remaps, compiled into one lookup."""
+from typing import Callable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from . import instrument
+from .cumulative import cumulative_integral
+from .sampling import sample
+
+
+class _Traverse(NamedTuple):
+    rate: Callable[[float], float]
+    step: float
+
+    def apply(self, u):
+        return cumulative_integral(self.rate, self.step)(u)
+
+    def slope(self, u):
+        return sample(self.rate, u)
+
+
+class _Remap(NamedTuple):
+    scale: float
+    offset: float
+
+    def apply(self, u):
+        return self.scale * u + self.offset
+
+    def slope(self, u):
+        return np.full(np.shape(u), float(self.scale))
+
+
+class _Warp(NamedTuple):
+    func: Callable[[float], float]
+    derivative: Optional[Callable[[float], float]]
+
+    def apply(self, u):
+        return sample(self.func, u)
+
+    def slope(self, u):
+        if self.derivative is not None:
+            return sample(self.derivative, u)
+        h = 1e-6 * np.maximum(np.abs(u), 1)
+        return (sample(self.func, u + h) - sample(self.func, u - h)) / (2 * h)
+
+
+class Chain:
+    """A declared chain of time maps, applied to t from first to last.
+
+    `traverse(rate)` maps u to Ω(u), the integral of rate from 0 to u,
+    `remap(scale, offset)` maps u to scale * u + offset, and `warp(func)`
+    maps u to func(u). The noise traversal of NoiseFunctionBounce is
+    `Chain().traverse(bounce).remap(0.3).warp(noise)`. Calling a chain
+    evaluates every stage in turn, and `compile` fuses it into a single
+    lookup. Chains are immutable; each method returns a longer chain.
+    """
+
+    def __init__(self, stages: Tuple = ()):
+        self.stages = tuple(stages)
+
+    def traverse(self, rate: Callable[[float], float],
+                 step: float = 0.01) -> "Chain":
+        """Adds Ω of rate, from the rate's shared cumulative table."""
+        return Chain(self.stages + (_Traverse(rate, step), ))
+
+    def remap(self, scale: float = 1, offset: float = 0) -> "Chain":
+        """Adds an affine remap, folded into a remap before it if any."""
+        if self.stages and isinstance(self.stages[-1], _Remap):
+            last = self.stages[-1]
+            return Chain(self.stages[:-1] + (_Remap(
+                scale * last.scale, scale * last.offset + offset), ))
+        return Chain(self.stages + (_Remap(scale, offset), ))
+
+    def warp(self,
+             func: Callable[[float], float],
+             derivative: Optional[Callable[[float], float]] = None
+             ) -> "Chain":
+        """Adds an arbitrary map, differentiated numerically if needed."""
+        return Chain(self.stages + (_Warp(func, derivative), ))
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        for stage in self.stages:
+            t = np.asarray(stage.apply(t), dtype=float)
+        return t if t.ndim else float(t)
+
+    def derivative(self, t):
+        """d/dt of the whole chain, by the chain rule."""
+        u = np.asarray(t, dtype=float)
+        slope = np.ones(u.shape)
+        for stage in self.stages:
+            slope = slope * stage.slope(u)
+            u = np.asarray(stage.apply(u), dtype=float)
+        return slope if slope.ndim else float(slope)
+
+    def compile(self,
+                start: float = 0,
+                end: float = 0,
+                step: float = 0.01) -> "CompiledChain":
+        return CompiledChain(self, start, end, step)
+
+
+class CompiledChain:
+    """A chain fused into one lookup per sample, however long it is.
+
+    A chain with at most one traversal or warp is folded into that stage's
+    own lookup, with the remaps on either side applied as one multiply-add,
+    so it is exact. A longer chain is tabulated: its value and chain-rule
+    derivative are computed once per grid point of spacing `step`, and a
+    query is one cubic Hermite interpolation, accurate to O(step^4) where
+    the chain is smooth. Like `CumulativeIntegral`, the table grows on
+    demand when a query falls outside the range built so far.
+    """
+
+    def __init__(self,
+                 chain: Chain,
+                 start: float = 0,
+                 end: float = 0,
+                 step: float = 0.01):
+        if step <= 0:
+            raise ValueError("step must be positive")
+        self.chain = chain
+        self.step = step
+        inner = [
+            i for i, stage in enumerate(chain.stages)
+            if not isinstance(stage, _Remap)
+        ]
+        self._tabulated = len(inner) > 1
+        if self._tabulated:
+            self._first = 0
+            self._values = chain(np.zeros(1))
+            self._slopes = chain.derivative(np.zeros(1))
+            self._ensure(int(np.floor(start / step)),
+                         int(np.ceil(end / step)))
+        else:
+            split = inner[0] if inner else len(chain.stages)
+            self._before = _fold(chain.stages[:split])
+            self._stage = chain.stages[split] if inner else None
+            self._after = _fold(chain.stages[split + 1:])
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        if instrument.ENABLED:
+            instrument.count_call("evaluate", self, t.size)
+        if not self._tabulated:
+            u = self._before.apply(t)
+            if self._stage is not None:
+                u = np.asarray(self._stage.apply(u), dtype=float)
+            result = self._after.apply(u)
+            return result if result.ndim else float(result)
+        if t.size == 0:
+            return np.zeros(t.shape)
+        k = np.floor(t / self.step)
+        self._ensure(int(k.min()), int(k.max()) + 1)
+        i = k.astype(int) - self._first
+        s = t / self.step - k
+        y0, y1 = self._values[i], self._values[i + 1]
+        m0 = self._slopes[i] * self.step
+        m1 = self._slopes[i + 1] * self.step
+        result = y0 + s * (m0 + s * ((3 * (y1 - y0) - 2 * m0 - m1) + s *
+                                     (2 * (y0 - y1) + m0 + m1)))
+        return result if result.ndim else float(result)
+
+    @property
+    def range(self) -> tuple[float, float]:
+        """Span of t currently covered by the table."""
+        if not self._tabulated:
+            return -np.inf, np.inf
+        last = self._first + len(self._values) - 1
+        return self._first * self.step, last * self.step
+
+    def _ensure(self, lo: int, hi: int):
+        """Tabulates grid indices lo..hi, at least doubling the span."""
+        first = self._first
+        last = first + len(self._values) - 1
+        span = last - first + 1
+        if hi > last:
+            hi = max(hi, last + span)
+            t = np.arange(last + 1, hi + 1) * self.step
+            self._values = np.concatenate((self._values, self.chain(t)))
+            self._slopes = np.concatenate(
+                (self._slopes, self.chain.derivative(t)))
+        if lo < first:
+            lo = min(lo, first - span)
+            t = np.arange(lo, first) * self.step
+            self._values = np.concatenate((self.chain(t), self._values))
+            self._slopes = np.concatenate(
+                (self.chain.derivative(t), self._slopes))
+            self._first = lo
+
+
+def _fold(stages) -> _Remap:
+    """The single remap equivalent to a run of remaps."""
+    remap = _Remap(1.0, 0.0)
+    for stage in stages:
+        remap = _Remap(stage.scale * remap.scale,
+                       stage.scale * remap.offset + stage.offset)
+    return remap
@@ -0,0 +1,133 @@
+"""Retiming of baked clips: f(t) = g(Ω(t)) where g is sampled data.
+
+Example, retiming a mocap take stored as a (frames x channels) .npy file
+so it plays at twice the speed, without loading the take into memory:
+
+    retime_file("take.npy", "fast.npy", 2, frames=1200)
+"""
+from typing import Optional
+
+import numpy as np
+
+from .cumulative import cumulative_integral
+from .curves import _BLOCK_ELEMENTS, Rate, as_rate
+
+MODES = ("hold", "loop")
+
+
+class Clip:
+    """A baked clip used as the target g of a traversal.
+
+    samples is a (frames, ...) array sampled at `fps` from time `start`,
+    with any number of channels after the first axis. It can be a
+    memory-mapped array, in which case a call reads only the frames it
+    interpolates between. Calling the clip with an array of times returns
+    the linearly interpolated samples, shaped times.shape + channels.
+    Outside the clip the end frames are held, or with `mode="loop"` the
+    clip repeats, blending its last frame into its first.
+    """
+
+    def __init__(self,
+                 samples,
+                 fps: float = 24,
+                 start: float = 0,
+                 mode: str = "hold"):
+        if not hasattr(samples, "shape"):
+            samples = np.asarray(samples, dtype=float)
+        if samples.ndim == 0 or len(samples) == 0:
+            raise ValueError("a clip needs at least one frame")
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.samples = samples
+        self.fps = fps
+        self.start = start
+        self.mode = mode
+
+    @property
+    def dtype(self):
+        """Floating type of interpolated samples."""
+        return np.result_type(self.samples.dtype, np.float32)
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        frames = len(self.samples)
+        position = (t.ravel() - self.start) * self.fps
+        if self.mode == "loop":
+            position = np.mod(position, frames)
+        else:
+            position = np.clip(position, 0, frames - 1)
+        lower = np.minimum(np.floor(position).astype(np.intp), frames - 1)
+        upper = lower + 1
+        upper[upper == frames] = 0 if self.mode == "loop" else frames - 1
+        weight = (position - lower).astype(self.dtype)
+        before = np.asarray(self.samples[lower], dtype=self.dtype)
+        after = np.asarray(self.samples[upper], dtype=self.dtype)
+        weight = weight.reshape((-1, ) + (1, ) * (before.ndim - 1))
+        result = before + (after - before) * weight
+        result = result.reshape(t.shape + self.samples.shape[1:])
+        return result if result.ndim else float(result)
+
+
+def retime(clip: Clip,
+           rate: Rate,
+           times,
+           step: float = 0.01,
+           chunk_size: Optional[int] = None,
+           out: Optional[np.ndarray] = None) -> np.ndarray:
+    """The clip played through rate: clip(Ω(t)) at every time in times.
+
+    Ω integrates rate from 0, so a rate of 1 plays the clip as recorded.
+    Times are processed in chunks of `chunk_size`, by default about four
+    million output values, and written into out, which may be a
+    memory-mapped array, so only one chunk of the result and the clip
+    frames it reads are in memory at once.
+    """
+    times = np.asarray(times, dtype=float)
+    if times.ndim != 1:
+        raise ValueError("times must be a 1-D array")
+    if out is None:
+        out = np.empty(times.shape + clip.samples.shape[1:], clip.dtype)
+    omega = cumulative_integral(as_rate(rate), step)
+    size = chunk_size or _chunk_frames(clip)
+    for begin in range(0, len(times), size):
+        chunk = times[begin:begin + size]
+        out[begin:begin + len(chunk)] = clip(omega(chunk))
+    return out
+
+
+def retime_file(source: str,
+                destination: str,
+                rate: Rate,
+                frames: int,
+                fps: float = 24,
+                out_fps: Optional[float] = None,
+                start: float = 0,
+                mode: str = "hold",
+                step: float = 0.01,
+                chunk_size: Optional[int] = None):
+    """Retimes a (frames x ...) .npy clip into another .npy file.
+
+    Both files are memory-mapped and the output is written chunk by chunk,
+    so takes longer than memory can be retimed. The source is sampled at
+    fps from time start, and frames output frames are written at out_fps,
+    which defaults to fps.
+    """
+    clip = Clip(np.load(source, mmap_mode="r"), fps, start, mode)
+    out_fps = out_fps or fps
+    out = np.lib.format.open_memmap(destination,
+                                    mode="w+",
+                                    dtype=clip.dtype,
+                                    shape=(frames, ) +
+                                    clip.samples.shape[1:])
+    size = chunk_size or _chunk_frames(clip)
+    for begin in range(0, frames, size):
+        times = np.arange(begin, min(begin + size, frames)) / out_fps
+        retime(clip, rate, times, step, out=out[begin:begin + len(times)])
+    out.flush()
+
+
+def _chunk_frames(clip: Clip) -> int:
+    channels = int(np.prod(clip.samples.shape[1:], dtype=np.int64))
+    return max(1, _BLOCK_ELEMENTS // max(channels, 1))
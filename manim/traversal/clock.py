@@ -0,0 +1,111 @@
+"""Stateful, frame-by-frame traversal of a rate function."""
+from bisect import bisect_left
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from .sampling import sample
+
+_CHUNK = 1 << 16
+
+
+class TraversalClock:
+    """Running integral of omega that carries its state between queries.
+
+    Moving the clock only integrates the interval since the last query, so
+    stepping forward or backward by dt costs O(|dt| / step) and playing a
+    timeline of n frames costs O(n) in total. Every `checkpoint_interval`
+    grid steps the running value is recorded, and a random jump resumes from
+    whichever of the current position and the nearest checkpoint is closer.
+
+    The grid and interpolation match `CumulativeIntegral`, so both return
+    the same values for the same omega and step.
+    """
+
+    def __init__(self,
+                 func: Callable[[float], float],
+                 step: float = 0.01,
+                 checkpoint_interval: int = 1000):
+        if step <= 0:
+            raise ValueError("step must be positive")
+        if checkpoint_interval < 1:
+            raise ValueError("checkpoint_interval must be at least 1")
+        self.func = func
+        self.step = step
+        self.checkpoint_interval = checkpoint_interval
+        self.t = 0.0
+        self.value = 0.0
+        self._k = 0
+        self._value_k = 0.0
+        self._rate_k = float(sample(func, 0.0))
+        self._rate_next = None
+        self._checkpoints = [0]
+        self._checkpoint_states = {0: (0.0, self._rate_k)}
+
+    def __call__(self, t: float) -> float:
+        return self.seek(t)
+
+    def seek(self, t: float) -> float:
+        """Moves the clock to time t and returns the integral up to t."""
+        k = int(np.floor(t / self.step))
+        self._move(k)
+        if self._rate_next is None:
+            self._rate_next = float(sample(self.func, (k + 1) * self.step))
+        s = t - k * self.step
+        w0, w1 = self._rate_k, self._rate_next
+        self.t = t
+        self.value = self._value_k + s * (w0 + (w1 - w0) * s /
+                                          (2 * self.step))
+        return self.value
+
+    def advance(self, dt: float) -> float:
+        """Moves the clock by dt, which may be negative."""
+        return self.seek(self.t + dt)
+
+    def frames(self, times: Iterable[float]) -> Iterator[float]:
+        """Yields the integral at each time, in order, for playback."""
+        for t in times:
+            yield self.seek(t)
+
+    def _move(self, k: int):
+        """Walks the grid position to index k from the closest known state."""
+        if k == self._k:
+            return
+        checkpoint = self._nearest_checkpoint(k)
+        if abs(k - checkpoint) < abs(k - self._k):
+            self._k = checkpoint
+            self._value_k, self._rate_k = self._checkpoint_states[checkpoint]
+        while self._k != k:
+            direction = 1 if k > self._k else -1
+            end = self._k + direction * min(abs(k - self._k), _CHUNK)
+            self._walk(end, direction)
+        self._rate_next = None
+
+    def _walk(self, end: int, direction: int):
+        indices = np.arange(self._k + direction, end + direction, direction)
+        rates = sample(self.func, indices * self.step)
+        edges = np.concatenate(([self._rate_k], rates))
+        steps = (edges[:-1] + edges[1:]) * (self.step / 2)
+        values = self._value_k + direction * np.cumsum(steps)
+        for i in np.flatnonzero(indices % self.checkpoint_interval == 0):
+            self._record(int(indices[i]), float(values[i]), float(rates[i]))
+        self._k = end
+        self._value_k = float(values[-1])
+        self._rate_k = float(rates[-1])
+
+    def _nearest_checkpoint(self, k: int) -> int:
+        i = bisect_left(self._checkpoints, k)
+        candidates = self._checkpoints[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda c: abs(k - c))
+
+    def _record(self, k: int, value: float, rate: float):
+        if k not in self._checkpoint_states:
+            self._checkpoints.insert(bisect_left(self._checkpoints, k), k)
+            self._checkpoint_states[k] = (value, rate)
+
+
+def stream(func: Callable[[float], float],
+           times: Iterable[float],
+           step: float = 0.01) -> Iterator[float]:
+    """Generator of the integral of func at each of the given times."""
+    return TraversalClock(func, step).frames(times)
@@ -0,0 +1,229 @@
+"""Cached cumulative integrals of rate functions."""
+import os
+from functools import lru_cache
+from typing import Callable, Optional
+
+import numpy as np
+
+from . import instrument
+from .adaptive import AdaptiveIntegral
+from .edits import IntegralEdit
+from .sampling import sample
+
+# Grid points per block of the shift table used by `CumulativeIntegral.edit`
+_BLOCK = 1024
+
+# Span of t from 0 that tables served from an `IntegralCache` cover; they
+# still grow on demand past it, in memory
+CACHED_SPAN = 1000.0
+
+
+class CumulativeIntegral:
+    """Precomputed running integral of a rate function omega.
+
+    omega is sampled once on a uniform grid of spacing `step` anchored at
+    t = 0 and summed with the trapezoid rule. Between grid points the linear
+    interpolant of the samples is integrated exactly, so calling the table
+    answers the integral from 0 to t in O(1) for any t, fractional and
+    negative included. The table grows on demand when a query falls outside
+    the sampled range, and `edit` patches it in place when omega changes.
+    """
+
+    def __init__(self,
+                 func: Callable[[float], float],
+                 step: float = 0.01,
+                 start: float = 0,
+                 end: float = 0):
+        if step <= 0:
+            raise ValueError("step must be positive")
+        self.func = func
+        self.step = step
+        self._first = 0
+        self._rates = self._sample(0, 1)
+        self._values = np.zeros(1)
+        # Pending constant shifts per block of _BLOCK grid points, and the
+        # raw value at t = 0, so an edit never rewrites the whole table
+        self._offsets = np.zeros(1)
+        self._origin = 0.0
+        self._ensure(int(np.floor(start / step)), int(np.ceil(end / step)))
+
+    @classmethod
+    def from_table(cls, func: Callable[[float], float], step: float,
+                   first: int, rates, values) -> "CumulativeIntegral":
+        """Wraps an already computed table starting at grid index first.
+
+        values are running sums of the trapezoid cells over rates and may
+        have any constant offset; the table must include t = 0.
+        """
+        rates = np.asarray(rates, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if rates.shape != values.shape or rates.ndim != 1:
+            raise ValueError("rates and values must be matching 1-D arrays")
+        if not first <= 0 < first + len(values):
+            raise ValueError("the table must include t = 0")
+        table = cls.__new__(cls)
+        table.func = func
+        table.step = step
+        table._first = first
+        table._rates = rates
+        table._values = values
+        table._offsets = np.zeros(-(-len(values) // _BLOCK))
+        table._origin = float(values[-first])
+        return table
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        if instrument.ENABLED:
+            instrument.count_call("integral", self, t.size)
+        if t.size == 0:
+            return np.zeros(t.shape)
+        k = np.floor(t / self.step)
+        self._ensure(int(k.min()), int(k.max()) + 1)
+        i = k.astype(int) - self._first
+        s = t - k * self.step
+        w0 = self._rates[i]
+        w1 = self._rates[i + 1]
+        result = self._value(i) + s * (w0 + (w1 - w0) * s / (2 * self.step))
+        return result if result.ndim else float(result)
+
+    def edit(self,
+             a: float,
+             b: float,
+             func: Optional[Callable[[float], float]] = None) -> IntegralEdit:
+        """Re-integrates after omega changed on [a, b], and reports the change.
+
+        Only the grid points in [a, b] are sampled again, with `func` if
+        given, which also replaces omega for later growth. Values after the
+        window all move by the same amount, which is added to a per-block
+        shift instead of to every value, so an edit costs O(b - a) plus one
+        block, not O(timeline). The returned `IntegralEdit` says which times
+        changed and by how much.
+        """
+        if b < a:
+            raise ValueError("edit range must have a <= b")
+        if func is not None:
+            self.func = func
+        lo = int(np.floor(a / self.step))
+        hi = int(np.ceil(b / self.step))
+        self._ensure(lo - 1, hi + 1)
+        if not self._values.flags.writeable:
+            # Mapped read-only from an IntegralCache file
+            self._rates = self._rates.copy()
+            self._values = self._values.copy()
+        i, j = lo - self._first, hi - self._first
+        cells = np.arange(i, j + 2)
+        before = self._value(cells)
+        self._rates[i:j + 1] = self._sample(lo, hi + 1)
+        edges = self._rates[i - 1:j + 2]
+        after = self._value(i - 1) + np.cumsum(
+            (edges[:-1] + edges[1:]) * (self.step / 2))
+        self._values[i:j + 2] = after - self._offsets[cells // _BLOCK]
+        delta = float(after[-1] - before[-1])
+        tail = j + 2
+        block = tail // _BLOCK + 1
+        self._values[tail:block * _BLOCK] += delta
+        self._offsets[block:] += delta
+        origin = self._origin
+        self._origin = 0.0
+        self._origin = float(self._value(-self._first))
+        shift = self._origin - origin
+        return IntegralEdit((lo - 1) * self.step, (hi + 1) * self.step, -shift,
+                            delta - shift)
+
+    @property
+    def range(self) -> tuple[float, float]:
+        """Span of t currently covered by the table."""
+        last = self._first + len(self._values) - 1
+        return self._first * self.step, last * self.step
+
+    def _value(self, i):
+        """Integral from 0 at table index i, with pending shifts applied."""
+        return self._values[i] + self._offsets[i // _BLOCK] - self._origin
+
+    def _sample(self, lo: int, hi: int) -> np.ndarray:
+        """Samples omega on grid indices lo <= k < hi."""
+        return sample(self.func, np.arange(lo, hi) * self.step)
+
+    def _ensure(self, lo: int, hi: int):
+        """Grows the table so grid indices lo..hi are covered.
+
+        Growth at least doubles the covered span so a sweep over an
+        increasing range costs amortised O(1) per query.
+        """
+        first = self._first
+        last = first + len(self._values) - 1
+        span = last - first + 1
+        if lo >= first and hi <= last:
+            return
+        # Growth rewrites the table anyway, so apply the edit shifts first
+        self._values = self._values + np.repeat(self._offsets, _BLOCK)[:span]
+        if hi > last:
+            hi = max(hi, last + span)
+            rates = self._sample(last + 1, hi + 1)
+            edges = np.concatenate(([self._rates[-1]], rates))
+            steps = (edges[:-1] + edges[1:]) * (self.step / 2)
+            self._rates = np.concatenate((self._rates, rates))
+            self._values = np.concatenate(
+                (self._values, self._values[-1] + np.cumsum(steps)))
+        if lo < first:
+            lo = min(lo, first - span)
+            rates = self._sample(lo, first)
+            edges = np.concatenate((rates, [self._rates[0]]))
+            steps = (edges[:-1] + edges[1:]) * (self.step / 2)
+            self._rates = np.concatenate((rates, self._rates))
+            self._values = np.concatenate(
+                (self._values[0] - np.cumsum(steps[::-1])[::-1],
+                 self._values))
+            self._first = lo
+        self._offsets = np.zeros(-(-len(self._values) // _BLOCK))
+
+
+def cumulative_integral(func: Callable[[float], float],
+                        step: float = 0.01,
+                        atol: Optional[float] = None,
+                        rtol: Optional[float] = None) -> Callable:
+    """Returns the shared cumulative table for func at the given step.
+
+    Passing atol or rtol builds an `AdaptiveIntegral` held to that tolerance
+    instead of a fixed-step table; the one not given is 0, and the other
+    must then be positive. Rate curves that know their own antiderivative,
+    such as `PiecewiseLinear`, return its exact `integral` and are never
+    sampled; as they can be edited they are not kept in the shared cache
+    either, so the integral always follows their current keys. Tables of
+    other rate functions are built once per argument set and assume func
+    does not change; use `CumulativeIntegral.edit` when it does. When
+    TRAVERSAL_CACHE_DIR is set, fixed-step tables over [0, CACHED_SPAN]
+    are shared through an `IntegralCache` in that directory, so later
+    renders and other processes map them from disk instead of sampling
+    func again.
+    """
+    exact = getattr(func, "integral", None)
+    if exact is not None:
+        return exact
+    return _table(func, step, atol, rtol)
+
+
+@lru_cache(maxsize=64)
+def _table(func: Callable[[float], float], step: float,
+           atol: Optional[float], rtol: Optional[float]) -> Callable:
+    if atol is not None or rtol is not None:
+        return AdaptiveIntegral(func, atol=atol or 0, rtol=rtol or 0)
+    directory = os.environ.get("TRAVERSAL_CACHE_DIR")
+    if directory:
+        from .cache import IntegralCache
+        try:
+            cache = IntegralCache(directory)
+        except OSError:
+            # An unusable cache directory only costs the sampling
+            return CumulativeIntegral(func, step)
+        return cache.integral(func, step, 0, CACHED_SPAN)
+    return CumulativeIntegral(func, step)
+
+
+cumulative_integral.cache_clear = _table.cache_clear
+
+
+def traverse(g: Callable, func: Callable, t, step: float = 0.01):
+    """Evaluates f(t) = g(Ω(t)) for a whole array of times in one call."""
+    values = sample(g, cumulative_integral(func, step)(t))
+    return values if values.ndim else float(values)
@@ -0,0 +1,204 @@
+"""Keyframed rate curves with per-segment antiderivative indexes."""
+from typing import Callable, Union
+
+import numpy as np
+
+from . import instrument
+from .edits import IntegralEdit
+
+# A rate function of t, or a constant rate
+Rate = Union[Callable[[float], float], float]
+
+# Elements of one block of a chunked evaluation when no chunk size is given
+_BLOCK_ELEMENTS = 1 << 22
+
+
+def hermite_coefficients(times, values, in_slopes, out_slopes, step=False):
+    """Polynomial coefficients of each segment of a keyed Hermite curve.
+
+    Segment i is a0 + a1 s + a2 s^2 + a3 s^3 with s = t - times[i]; stepped
+    segments hold values[i]. The last key gets a constant segment for the
+    post-infinity hold. Keys run along the last axis, so a stack of curves
+    with the same key count gives a stack of coefficient arrays, shaped
+    (..., keys, 4).
+    """
+    times, values, in_slopes, out_slopes, step = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (times, values, in_slopes,
+                                               out_slopes, step)))
+    h = np.diff(times, axis=-1)
+    y0, y1 = values[..., :-1], values[..., 1:]
+    m0, m1 = out_slopes[..., :-1], in_slopes[..., 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        secant = (y1 - y0) / h
+        a2 = (3 * secant - 2 * m0 - m1) / h
+        a3 = (m0 + m1 - 2 * secant) / h**2
+    held = step[..., :-1].astype(bool)
+    coefficients = np.zeros(values.shape + (4,))
+    coefficients[..., 0] = values
+    coefficients[..., :-1, 1] = np.where(held, 0, m0)
+    coefficients[..., :-1, 2] = np.where(held, 0, a2)
+    coefficients[..., :-1, 3] = np.where(held, 0, a3)
+    return coefficients
+
+
+def segment_integrals(coefficients, s):
+    """Integral of each segment polynomial from 0 to s."""
+    a0, a1, a2, a3 = np.moveaxis(coefficients, -1, 0)
+    return s * (a0 + s * (a1 / 2 + s * (a2 / 3 + s * a3 / 4)))
+
+
+class AnimCurve:
+    """Keyed rate curve with cubic Hermite segments, like a Maya animCurve.
+
+    Keys and their in/out tangent slopes (value per unit time) are stored in
+    flat arrays. The polynomial of every segment, the integral of every
+    segment and a prefix sum over segments are computed once, so
+    `integral(t)` is a binary search for the segment plus one polynomial:
+    O(log k) for k keys, whatever t is. Outside the keys the curve holds its
+    end values, as Maya's constant pre and post infinity does. `set_key`
+    edits one key and rebuilds only the two segments that touch it.
+    """
+
+    def __init__(self,
+                 times,
+                 values,
+                 in_slopes=None,
+                 out_slopes=None,
+                 step=False):
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.array(values, dtype=float)
+        if self.times.ndim != 1 or self.times.shape != self.values.shape:
+            raise ValueError("times and values must be matching 1-D arrays")
+        if len(self.times) == 0:
+            raise ValueError("at least one key is required")
+        if np.any(np.diff(self.times) <= 0):
+            raise ValueError("key times must be strictly increasing")
+        if in_slopes is None or out_slopes is None:
+            linear = linear_slopes(self.times, self.values)
+            in_slopes = linear[0] if in_slopes is None else in_slopes
+            out_slopes = linear[1] if out_slopes is None else out_slopes
+        self.in_slopes = np.array(
+            np.broadcast_to(np.asarray(in_slopes, dtype=float),
+                            self.times.shape))
+        self.out_slopes = np.array(
+            np.broadcast_to(np.asarray(out_slopes, dtype=float),
+                            self.times.shape))
+        self.step = np.broadcast_to(np.asarray(step, dtype=bool),
+                                    self.times.shape)
+        self._coefficients = hermite_coefficients(self.times, self.values,
+                                                  self.in_slopes,
+                                                  self.out_slopes, self.step)
+        areas = segment_integrals(self._coefficients[:-1],
+                                  np.diff(self.times))
+        self._prefix = np.concatenate(([0], np.cumsum(areas)))
+        self._origin = 0
+        self._origin = self.integral(0)
+
+    @classmethod
+    def from_bezier(cls, times, values, in_handles,
+                    out_handles) -> "AnimCurve":
+        """Builds a curve from Bézier handles given as (dt, dv) offsets.
+
+        In-handles point backwards from their key and out-handles forwards.
+        Only the handle direction is used, so weighted tangents are read as
+        their unweighted equivalent.
+        """
+        in_handles = np.asarray(in_handles, dtype=float)
+        out_handles = np.asarray(out_handles, dtype=float)
+        return cls(times, values, in_handles[:, 1] / in_handles[:, 0],
+                   out_handles[:, 1] / out_handles[:, 0])
+
+    def __call__(self, t):
+        if instrument.ENABLED:
+            instrument.count_call("evaluate", self, np.size(t))
+        i, s = self._locate(t)
+        a0, a1, a2, a3 = np.moveaxis(self._coefficients[i], -1, 0)
+        s = np.maximum(s, 0)
+        result = a0 + s * (a1 + s * (a2 + s * a3))
+        return result if result.ndim else float(result)
+
+    def integral(self, t):
+        """Exact integral of the curve from 0 to t."""
+        if instrument.ENABLED:
+            instrument.count_call("integral", self, np.size(t))
+        i, s = self._locate(t)
+        # Before the first key only the held value contributes
+        coefficients = self._coefficients[i] * np.where(
+            (s < 0)[..., None], (1, 0, 0, 0), 1)
+        result = self._prefix[i] + segment_integrals(coefficients,
+                                                     s) - self._origin
+        return result if result.ndim else float(result)
+
+    def set_key(self,
+                index: int,
+                value=None,
+                in_slope=None,
+                out_slope=None) -> IntegralEdit:
+        """Changes one key in place and patches the integral index.
+
+        The segments on either side of the key are rebuilt and every later
+        prefix sum moves by the change in their area. Returns the
+        `IntegralEdit` describing how `integral` changed.
+        """
+        index = range(len(self.times))[index]
+        for name, new in (("value", value), ("in_slope", in_slope),
+                          ("out_slope", out_slope)):
+            if new is not None:
+                _check_finite(name, new)
+        for array, new in ((self.values, value), (self.in_slopes, in_slope),
+                           (self.out_slopes, out_slope)):
+            if new is not None:
+                array[index] = new
+        return self._rebuild(index)
+
+    def _rebuild(self, index: int) -> IntegralEdit:
+        """Recomputes the segments next to key index and shifts the rest."""
+        last = len(self.times) - 1
+        lo, hi = max(index - 1, 0), min(index + 1, last)
+        keys = slice(lo, hi + 1)
+        self._coefficients[lo:index + 1] = hermite_coefficients(
+            self.times[keys], self.values[keys], self.in_slopes[keys],
+            self.out_slopes[keys], self.step[keys])[:index - lo + 1]
+        # Segments lo up to the one starting at the key, if it has one
+        end = min(index, last - 1) + 1
+        areas = segment_integrals(self._coefficients[lo:end],
+                                  np.diff(self.times[lo:end + 1]))
+        prefix = self._prefix[lo] + np.cumsum(areas)
+        delta = float(prefix[-1] - self._prefix[end]) if end > lo else 0.0
+        self._prefix[lo + 1:end + 1] = prefix
+        self._prefix[end + 1:] += delta
+        origin = self._origin
+        self._origin = 0
+        self._origin = self.integral(0)
+        shift = float(self._origin - origin)
+        # The held end values reach to infinity
+        return IntegralEdit(
+            float(self.times[lo]) if index > 0 else -np.inf,
+            float(self.times[hi]) if index < last else np.inf, -shift,
+            delta - shift)
+
+    def _locate(self, t):
+        t = np.asarray(t, dtype=float)
+        i = np.clip(
+            np.searchsorted(self.times, t, side="right") - 1, 0, None)
+        return i, t - self.times[i]
+
+
+def linear_slopes(times, values):
+    """In and out slopes that join the keys with straight lines."""
+    secant = np.diff(values, axis=-1) / np.diff(times, axis=-1)
+    ends = np.zeros(secant.shape[:-1] + (1,))
+    return (np.concatenate((ends, secant), axis=-1),
+            np.concatenate((secant, ends), axis=-1))
+
+
+def as_rate(rate: Rate) -> Callable[[float], float]:
+    """rate if it is a function, else a curve holding it constant."""
+    if callable(rate):
+        return rate
+    return AnimCurve([0], [rate])
+
+
+def _check_finite(name: str, value):
+    if not np.isfinite(float(value)):
+        raise ValueError(f"{name} must be finite, got {value!r}")
@@ -0,0 +1,28 @@
+"""Records of in-place edits to cached integrals."""
+from typing import NamedTuple
+
+import numpy as np
+
+
+class IntegralEdit(NamedTuple):
+    """How an edit to omega moved its cached integral Ω.
+
+    Ω was recomputed on [start, end]. Every value before start moved by the
+    constant `before`, which is only non-zero when the edit moved Ω(0), and
+    every value after end moved by the constant `after`.
+    """
+    start: float
+    end: float
+    before: float
+    after: float
+
+    def changed(self, t, atol: float = 0) -> np.ndarray:
+        """Mask of the times t whose Ω value moved by more than atol.
+
+        Downstream caches keyed on output frames can use it to drop only the
+        frames the edit touched, e.g. `frames[edit.changed(frames)]`.
+        """
+        t = np.asarray(t, dtype=float)
+        inside = (t >= self.start) & (t <= self.end)
+        return (inside | ((t < self.start) & (abs(self.before) > atol)) |
+                ((t > self.end) & (abs(self.after) > atol)))
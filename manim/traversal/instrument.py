@@ -0,0 +1,122 @@
+"""Opt-in counters and timers for finding where a render spends its time.
+
+Set TRAVERSAL_PROFILE=1, or call `enable()`, to record how often rate
+functions are evaluated and integrals are looked up, and how long each
+timed updater takes, frame by frame. While disabled every hook is a single
+flag check, so the hooks stay in the hot paths for production renders.
+"""
+import functools
+import json
+import os
+from collections import Counter, defaultdict
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+ENABLED = bool(os.environ.get("TRAVERSAL_PROFILE"))
+
+_counts = Counter()
+_times = defaultdict(float)
+_frames = []
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """Drops everything recorded so far."""
+    _counts.clear()
+    _times.clear()
+    _frames.clear()
+
+
+def count(name: str, n: int = 1):
+    """Adds n to the counter name for the current frame."""
+    if ENABLED:
+        _counts[name] += n
+
+
+def count_call(kind: str, owner, n: int = 1):
+    """Counts n points passed to a rate function or integral owner."""
+    if ENABLED:
+        _counts[f"{kind} {label(owner)}"] += n
+
+
+def label(function) -> str:
+    """Readable name of a function, curve or other callable."""
+    name = getattr(function, "__qualname__", None)
+    if name is None:
+        name = type(function).__name__
+    return name
+
+
+def timed(name: str, function: Callable) -> Callable:
+    """Wraps function so each call is timed under name while enabled."""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return function(*args, **kwargs)
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _times[name] += perf_counter() - start
+            _counts[f"call {name}"] += 1
+
+    return wrapper
+
+
+def next_frame():
+    """Closes the current frame's counters and timers."""
+    if ENABLED:
+        _frames.append({"counts": dict(_counts), "seconds": dict(_times)})
+        _counts.clear()
+        _times.clear()
+
+
+def report() -> Dict:
+    """Totals and per-frame records of everything counted and timed."""
+    frames = _frames + ([{
+        "counts": dict(_counts),
+        "seconds": dict(_times)
+    }] if _counts or _times else [])
+    counts = Counter()
+    seconds = defaultdict(float)
+    for frame in frames:
+        counts.update(frame["counts"])
+        for name, value in frame["seconds"].items():
+            seconds[name] += value
+    return {
+        "frames": len(frames),
+        "counts": dict(counts),
+        "seconds": dict(seconds),
+        "per_frame": frames,
+    }
+
+
+def print_report(title: str = "traversal profile",
+                 data: Optional[Dict] = None):
+    data = data or report()
+    frames = max(data["frames"], 1)
+    print(f"{title}: {data['frames']} frames")
+    for name, value in sorted(data["seconds"].items(),
+                              key=lambda item: -item[1]):
+        print(f"  {name:<40} {value * 1e3:10.2f} ms total "
+              f"{value * 1e3 / frames:8.3f} ms/frame")
+    for name, value in sorted(data["counts"].items(),
+                              key=lambda item: -item[1]):
+        print(f"  {name:<40} {value:10d} total "
+              f"{value / frames:10.1f} /frame")
+
+
+def export(path: str, data: Optional[Dict] = None):
+    """Writes the report as JSON."""
+    with open(path, "w") as out:
+        json.dump(data or report(), out, indent=1)
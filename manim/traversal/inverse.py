@@ -0,0 +1,242 @@
+"""Inverse traversal lookup: the times at which Ω(t) reaches a phase."""
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from .cumulative import CumulativeIntegral, cumulative_integral
+from .sampling import sample
+
+# Newton steps taken against an exact integral after the table solve
+_POLISH = 2
+
+
+class InverseIndex:
+    """Answers "when does Ω(t) reach phase p" for whole arrays of phases.
+
+    The cumulative table over [start, end] is split at its knots and at the
+    turning points inside cells where omega changes sign, so Ω is monotone
+    on every piece. Consecutive pieces going the same way form monotone
+    runs. A phase is located by binary search inside each run whose range
+    holds it, and solved exactly in its piece, where the table is a
+    quadratic. When omega never changes sign there is a single run and the
+    lookup is one `searchsorted` over all phases. When omega goes negative
+    a phase can be reached several times, and `crossings` returns every
+    time.
+
+    Built with `InverseIndex(func, ...)`, the times invert the same table
+    `cumulative_integral` uses for func. Rate curves with an exact
+    `integral` are inverted against it, with a couple of Newton steps after
+    the table solve.
+    """
+
+    def __init__(self,
+                 func: Callable[[float], float],
+                 start: float,
+                 end: float,
+                 step: float = 0.01):
+        table = cumulative_integral(func, step)
+        if isinstance(table, CumulativeIntegral):
+            self._build(table, start, end)
+            return
+        lo, hi = _grid(start, end, step)
+        times = np.arange(lo, hi + 1) * step
+        self._build_knots(func, step, lo, np.asarray(table(times)),
+                          sample(func, times), start, end, table)
+
+    @classmethod
+    def from_table(cls, table: CumulativeIntegral, start: float,
+                   end: float) -> "InverseIndex":
+        """Inverts an existing table over [start, end]."""
+        index = cls.__new__(cls)
+        index._build(table, start, end)
+        return index
+
+    def first(self, phases):
+        """Earliest time each phase is reached, NaN where it never is."""
+        phases = np.asarray(phases, dtype=float)
+        which, times = self.crossings(phases)
+        result = np.full(phases.size, np.nan)
+        # crossings are sorted by time per phase, so the first one wins
+        result[which[::-1]] = times[::-1]
+        result = result.reshape(phases.shape)
+        return result if result.ndim else float(result)
+
+    def crossings(self, phases) -> Tuple[np.ndarray, np.ndarray]:
+        """Every time each phase is reached on [start, end].
+
+        Returns (which, times): which indexes the flattened phases, and the
+        pairs are sorted by phase index, then time. A turning point that
+        touches a phase is reported once, and a flat stretch at a phase
+        only at its start.
+        """
+        p = np.asarray(phases, dtype=float).ravel()
+        if len(self._run_starts) == 1:
+            which, run = self._locate_monotone(p)
+        else:
+            which, run = self._locate_runs(p)
+        piece = self._search(run, p[which])
+        times = self._solve(piece, p[which])
+        keep = (times >= self.start) & (times <= self.end)
+        which, times = which[keep], times[keep]
+        order = np.lexsort((times, which))
+        return which[order], times[order]
+
+    def _build(self, table: CumulativeIntegral, start: float, end: float):
+        lo, hi = _grid(start, end, table.step)
+        table._ensure(lo, hi)
+        knots = np.arange(lo, hi + 1) - table._first
+        self._build_knots(table.func, table.step, lo, table._value(knots),
+                          table._rates[knots], start, end, None)
+
+    def _build_knots(self, func: Callable, step: float, lo: int,
+                     values: np.ndarray, rates: np.ndarray, start: float,
+                     end: float, exact: Optional[Callable]):
+        """Splits the cells between grid knots lo, lo + 1, ... into pieces.
+
+        values and rates are Ω and omega at the knots. With an exact
+        integral the turning points are valued with it too, so a phase at
+        an extremum of the exact Ω isn't lost to the table's rounding.
+        """
+        self.func = func
+        self.start = start
+        self.end = end
+        self._exact = exact
+        hi = lo + len(values) - 1
+        w0, w1 = rates[:-1], rates[1:]
+        # A cell whose rates change sign turns inside, at s = h w0 / (w0 - w1)
+        turns = w0 * w1 < 0
+        cells = np.repeat(np.arange(hi - lo), 1 + turns)
+        first_piece = np.ones(len(cells), dtype=bool)
+        first_piece[1:] = cells[1:] != cells[:-1]
+        turn = np.zeros(len(w0))
+        turn[turns] = step * w0[turns] / (w0[turns] - w1[turns])
+        offset = np.where(first_piece, 0.0, turn[cells])
+        self._cell_time = (lo + cells) * step
+        self._value0 = values[cells]
+        self._slope = w0[cells]
+        self._curve = ((w1 - w0) / (2 * step))[cells]
+        self._offset = offset
+        # A piece ends where the next one starts, or at the end of its cell
+        self._limit = np.where(np.append(first_piece[1:], True), step,
+                               np.append(offset[1:], step))
+        bounds = self._value0 + offset * (self._slope +
+                                          self._curve * offset)
+        if exact is not None:
+            inside = ~first_piece
+            bounds[inside] = exact(self._cell_time[inside] + offset[inside])
+        self._bounds = np.append(bounds, values[-1])
+        direction = np.sign(np.diff(self._bounds))
+        self._direction = direction
+        change = np.flatnonzero(direction[1:] != direction[:-1]) + 1
+        self._run_starts = np.concatenate(([0], change))
+        self._run_ends = np.append(change, len(direction))
+
+    def _locate_monotone(self, p: np.ndarray):
+        """Phases inside the single run's range, all in run 0."""
+        low, high = sorted((self._bounds[0], self._bounds[-1]))
+        which = np.flatnonzero((p >= low) & (p <= high))
+        return which, np.zeros(len(which), dtype=int)
+
+    def _locate_runs(self, p: np.ndarray):
+        """Every (phase, run) pair where the run's range holds the phase.
+
+        Each run owns its end value but not its start value, which the run
+        before it already reached, except for the first run. The phases are
+        sorted once and each run finds its slice of them by binary search.
+        """
+        order = np.argsort(p, kind="stable")
+        ordered = p[order]
+        begin = self._bounds[self._run_starts]
+        end = self._bounds[self._run_ends]
+        direction = self._direction[self._run_starts]
+        rising = direction > 0
+        low = np.where(rising, begin, end)
+        high = np.where(rising, end, begin)
+        # rising runs hold (begin, end], falling ones [end, begin)
+        left = np.where(rising, np.searchsorted(ordered, low, "right"),
+                        np.searchsorted(ordered, low, "left"))
+        right = np.where(rising, np.searchsorted(ordered, high, "right"),
+                         np.searchsorted(ordered, high, "left"))
+        if direction[0] > 0:
+            left[0] = np.searchsorted(ordered, low[0], "left")
+        elif direction[0] < 0:
+            right[0] = np.searchsorted(ordered, high[0], "right")
+        else:
+            left[0] = np.searchsorted(ordered, low[0], "left")
+            right[0] = np.searchsorted(ordered, high[0], "right")
+        # Flat runs after the first never add a crossing of their own
+        right = np.maximum(right, left)
+        right[1:][direction[1:] == 0] = left[1:][direction[1:] == 0]
+        counts = right - left
+        run = np.repeat(np.arange(len(counts)), counts)
+        rank = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts) + left[run]
+        return order[rank], run
+
+    def _search(self, run: np.ndarray, p: np.ndarray) -> np.ndarray:
+        """Piece of each run that holds its phase, by binary search."""
+        if len(self._run_starts) == 1:
+            bounds = self._bounds * (self._direction[0] or 1)
+            key = p * (self._direction[0] or 1)
+            piece = np.searchsorted(bounds, key, "left") - 1
+            return np.clip(piece, 0, len(self._direction) - 1)
+        lo = self._run_starts[run].copy()
+        hi = self._run_ends[run].copy()
+        direction = self._direction[lo]
+        flat = direction == 0
+        key = p * direction
+        # Bisection on all (phase, run) pairs at once: the piece is the last
+        # lo with bound(lo) < p, going the run's way
+        while True:
+            open_ = hi - lo > 1
+            if not open_.any():
+                break
+            mid = (lo + hi) // 2
+            below = self._bounds[mid] * direction < key
+            lo = np.where(open_ & below, mid, lo)
+            hi = np.where(open_ & ~below, mid, hi)
+        lo[flat] = self._run_starts[run[flat]]
+        return lo
+
+    def _solve(self, piece: np.ndarray, p: np.ndarray) -> np.ndarray:
+        """Time in each piece where its quadratic reaches the phase."""
+        delta = p - self._value0[piece]
+        w = self._slope[piece]
+        q = self._curve[piece]
+        d = self._direction[piece]
+        root = np.sqrt(np.maximum(w * w + 4 * q * delta, 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Pick the root whose slope goes the piece's way, in the form
+            # that doesn't cancel
+            s = np.where(w * d > 0, 2 * delta / (w + d * root),
+                         (d * root - w) / (2 * q))
+        low = self._offset[piece]
+        high = self._limit[piece]
+        s = np.where(np.isfinite(s), s, low)
+        s = np.where(d == 0, low, np.clip(s, low, high))
+        t = self._cell_time[piece] + s
+        if self._exact is not None and len(t):
+            t = self._polish(t, p, self._cell_time[piece] + low,
+                             self._cell_time[piece] + high)
+        return t
+
+    def _polish(self, t, p, low, high):
+        """Newton steps on the exact integral, kept inside each piece."""
+        for _ in range(_POLISH):
+            rate = sample(self.func, t)
+            error = np.asarray(self._exact(t)) - p
+            moving = np.abs(rate) > 1e-12
+            t = np.where(moving,
+                         np.clip(t - error / np.where(moving, rate, 1), low,
+                                 high), t)
+        return t
+
+
+def _grid(start: float, end: float, step: float) -> Tuple[int, int]:
+    """Grid indices of the knots spanning [start, end]."""
+    if end < start:
+        raise ValueError("inverse range must have start <= end")
+    if step <= 0:
+        raise ValueError("step must be positive")
+    lo = int(np.floor(start / step))
+    return lo, max(int(np.ceil(end / step)), lo + 1)
@@ -0,0 +1,177 @@
+"""Optional JIT-compiled kernels for rate functions written as scalar code.
+
+Artists' rate functions are often plain scalar Python with `if` branches,
+which NumPy can only evaluate one element at a time. When numba is
+installed, `RateKernel` compiles such a function to a native loop, and
+`integrate` fuses it with the trapezoid integration into one native pass.
+Without numba, or for functions numba can't compile, both fall back to the
+NumPy path the rest of the package uses. A function that fails to compile
+raises a `RuntimeWarning`, and the kernel's `fallback` says why.
+"""
+import math
+import types
+import warnings
+from typing import Callable, Optional
+
+import numpy as np
+
+from .sampling import sample
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+AVAILABLE = numba is not None
+
+
+class RateKernel:
+    """A scalar rate function evaluated over whole arrays of times.
+
+    With `native` unset the function is compiled with numba when possible.
+    `native=False` forces the NumPy fallback, and `native=True` raises
+    when the function can't be compiled. `native` afterwards says which
+    path is used, and `fallback` why the NumPy path is used, if it is.
+    """
+
+    def __init__(self, func: Callable[[float], float],
+                 native: Optional[bool] = None):
+        self.func = func
+        self._scalar = None
+        self.fallback = None
+        if native is False:
+            self.fallback = "native=False"
+        elif not AVAILABLE:
+            self.fallback = "numba is not installed"
+        elif not isinstance(func, types.FunctionType):
+            self.fallback = f"{func!r} is not a plain Python function"
+        else:
+            try:
+                self._scalar = numba.njit("float64(float64)")(
+                    _with_compiled_helpers(func, {}))
+            except Exception as error:
+                self.fallback = f"numba can't compile {func!r}: {error}"
+                if native:
+                    raise ValueError(self.fallback) from error
+                warnings.warn(f"{self.fallback}; using NumPy instead",
+                              RuntimeWarning,
+                              stacklevel=2)
+        if native and self.fallback is not None:
+            raise ValueError(self.fallback)
+        self.native = self._scalar is not None
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        if not self.native:
+            values = sample(self.func, t)
+        else:
+            values = _apply(self._scalar,
+                            np.ascontiguousarray(t.ravel())).reshape(t.shape)
+        return values if values.ndim else float(values)
+
+
+def integrate(func: Callable[[float], float],
+              t,
+              step: float = 0.01,
+              native: Optional[bool] = None):
+    """Integral of func from 0 to every time in t, in one fused pass.
+
+    func is sampled on a grid of spacing step covering 0 and all of t,
+    summed with the trapezoid rule and interpolated the way
+    `CumulativeIntegral` does, so both give the same values. With numba
+    the sampling, the running sum and the lookups are one native loop.
+    """
+    if step <= 0:
+        raise ValueError("step must be positive")
+    kernel = func if isinstance(func, RateKernel) else RateKernel(
+        func, native)
+    t = np.asarray(t, dtype=float)
+    if t.size == 0:
+        return np.zeros(t.shape)
+    flat = np.ascontiguousarray(t.ravel())
+    if kernel.native:
+        result = _integral_native(kernel._scalar, flat, step)
+    else:
+        result = _integral_numpy(kernel, flat, step)
+    result = result.reshape(t.shape)
+    return result if result.ndim else float(result)
+
+
+def _with_compiled_helpers(func: types.FunctionType, compiled: dict):
+    """Copy of func that calls compiled versions of its helper functions.
+
+    numba can't call plain Python functions, so the ones func reads from
+    its globals or closure, such as `piecewise` in `solutions.omega`, are
+    compiled too, recursively.
+    """
+    namespace = dict(func.__globals__)
+    for name in func.__code__.co_names:
+        namespace[name] = _compile_helper(namespace.get(name), compiled)
+    closure = tuple(
+        types.CellType(_compile_helper(cell.cell_contents, compiled))
+        for cell in func.__closure__ or ())
+    return types.FunctionType(func.__code__, namespace, func.__name__,
+                              func.__defaults__, closure or None)
+
+
+def _compile_helper(value, compiled: dict):
+    if not isinstance(value, types.FunctionType):
+        return value
+    if value not in compiled:
+        # Recursive helpers stay plain Python and fail to compile
+        compiled[value] = value
+        compiled[value] = numba.njit(_with_compiled_helpers(value, compiled))
+    return compiled[value]
+
+
+def _grid(t: np.ndarray, step: float):
+    lo = min(0, math.floor(t.min() / step))
+    hi = max(0, math.floor(t.max() / step) + 1)
+    return lo, hi
+
+
+def _integral_numpy(rate: Callable, t: np.ndarray, step: float):
+    lo, hi = _grid(t, step)
+    rates = rate(np.arange(lo, hi + 1) * step)
+    values = np.concatenate(
+        ([0.0], np.cumsum((rates[:-1] + rates[1:]) * (step / 2))))
+    k = np.floor(t / step)
+    i = k.astype(np.int64) - lo
+    s = t - k * step
+    w0 = rates[i]
+    w1 = rates[i + 1]
+    return values[i] - values[-lo] + s * (w0 + (w1 - w0) * s / (2 * step))
+
+
+if AVAILABLE:
+
+    @numba.njit
+    def _apply(rate, t):
+        out = np.empty(t.size)
+        for j in range(t.size):
+            out[j] = rate(t[j])
+        return out
+
+    @numba.njit
+    def _integral_native(rate, t, step):
+        lo = min(0, int(np.floor(t.min() / step)))
+        hi = max(0, int(np.floor(t.max() / step)) + 1)
+        rates = np.empty(hi - lo + 1)
+        for k in range(len(rates)):
+            rates[k] = rate((lo + k) * step)
+        values = np.empty(len(rates))
+        values[0] = 0.0
+        for k in range(1, len(rates)):
+            values[k] = values[k - 1] + (rates[k - 1] + rates[k]) * (step /
+                                                                     2)
+        origin = values[-lo]
+        out = np.empty(t.size)
+        for j in range(t.size):
+            k = np.floor(t[j] / step)
+            i = int(k) - lo
+            s = t[j] - k * step
+            w0 = rates[i]
+            w1 = rates[i + 1]
+            out[j] = (values[i] - origin + s * (w0 + (w1 - w0) * s /
+                                                (2 * step)))
+        return out
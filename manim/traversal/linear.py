@@ -0,0 +1,38 @@
+"""Rate curves with exact, closed-form integrals."""
+import numpy as np
+
+from .curves import AnimCurve, _check_finite
+from .edits import IntegralEdit
+
+
+class PiecewiseLinear(AnimCurve):
+    """Rate curve through keys (times, values), held constant past the ends.
+
+    Between keys the rate is linear, or held at the left key when `step` is
+    set. The antiderivative is then piecewise quadratic, and `integral(t)`
+    evaluates it exactly from per-segment prefix sums. It does no sampling,
+    has no discretisation error, and finds the segment by binary search,
+    which is O(1) for the two-key ramps used by the scenes.
+    """
+
+    def __init__(self, times, values, step: bool = False):
+        super().__init__(times, values, step=step)
+
+    @classmethod
+    def ramp(cls, a: float, b: float, f1: float,
+             f2: float) -> "PiecewiseLinear":
+        """Constant f1 until a, then ramps linearly to f2 at b, as piecewise"""
+        return cls([a, b], [f1, f2])
+
+    def set_key(self, index: int, value: float) -> IntegralEdit:
+        """Moves one key to a new value, keeping its segments straight."""
+        if value is None:
+            raise ValueError("value is required for a linear curve")
+        _check_finite("value", value)
+        index = range(len(self.times))[index]
+        self.values[index] = value
+        keys = slice(max(index - 1, 0), index + 2)
+        secant = np.diff(self.values[keys]) / np.diff(self.times[keys])
+        self.out_slopes[keys][:-1] = secant
+        self.in_slopes[keys][1:] = secant
+        return self._rebuild(index)
@@ -0,0 +1,375 @@
+"""Streaming extraction of animation curves from Maya ASCII (.ma) scenes.
+
+Only the statements that matter for traversal are kept: animCurve nodes and
+their keys and tangents, static attribute values and defaults of the
+requested nodes, the connections out of animCurves, and the scene's time
+unit. Everything else, including large mesh and script blocks, is skipped
+line by line without being held in memory, so scenes of hundreds of MB can
+be read on a farm machine without Maya.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .curves import AnimCurve, linear_slopes
+
+CONTROLLER_ATTRIBUTES = ("frequency", "amplitude", "oscillationCenter",
+                         "phase", "timeOffset")
+
+# Frames per second for the named time units of `currentUnit -t`
+TIME_UNITS = {
+    "game": 15,
+    "film": 24,
+    "pal": 25,
+    "ntsc": 30,
+    "show": 48,
+    "palf": 50,
+    "ntscf": 60,
+}
+
+# Tangent type codes as written to .kit/.kot and .tan by Maya ASCII
+FIXED, LINEAR, FLAT, STEP, CLAMPED, AUTO = 1, 2, 3, 5, 10, 18
+
+_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|[^\s;]+')
+_INDEX = re.compile(r"^\.(\w+)(?:\[(\d+)(?::(\d+))?\])?$")
+_KEY_ARRAYS = ("ktv", "kit", "kot", "kix", "kiy", "kox", "koy")
+_SET_ATTR_FLAGS = {"-s", "-k", "-l", "-cb", "-av", "-type", "-c", "-ch"}
+
+
+@dataclass
+class AnimCurveNode:
+    """Keys, tangents and settings of one animCurve node."""
+    name: str
+    node_type: str
+    times: np.ndarray
+    values: np.ndarray
+    in_types: np.ndarray
+    out_types: np.ndarray
+    in_tangents: Optional[np.ndarray] = None
+    out_tangents: Optional[np.ndarray] = None
+    weighted: bool = False
+
+    def to_curve(self, fps: float = 24) -> AnimCurve:
+        """Rate curve over frames with the tangents Maya would use.
+
+        Fixed tangents use their stored (x, y) direction, with x in seconds.
+        Weighted tangents are read by direction only.
+        """
+        in_slopes, out_slopes = tangent_slopes(self.times, self.values,
+                                               self.in_types, self.out_types)
+        for slopes, tangents in ((in_slopes, self.in_tangents),
+                                 (out_slopes, self.out_tangents)):
+            if tangents is not None:
+                fixed = ~np.isnan(tangents[:, 0]) & (tangents[:, 0] != 0)
+                slopes[fixed] = (tangents[fixed, 1] /
+                                 (tangents[fixed, 0] * fps))
+        return AnimCurve(self.times, self.values, in_slopes, out_slopes,
+                         self.out_types == STEP)
+
+
+@dataclass
+class MayaScene:
+    """Traversal-relevant contents of a Maya ASCII scene."""
+    fps: float = 24
+    curves: Dict[str, AnimCurveNode] = field(default_factory=dict)
+    connections: List[Tuple[str, str]] = field(default_factory=list)
+    values: Dict[str, List[str]] = field(default_factory=dict)
+    defaults: Dict[str, float] = field(default_factory=dict)
+
+    def driver(self, plug: str) -> Optional[AnimCurveNode]:
+        """The animCurve connected into plug, if any."""
+        for source, destination in self.connections:
+            if _same_plug(destination, plug):
+                curve = self.curves.get(_short(source.split(".")[0]))
+                if curve is not None:
+                    return curve
+        return None
+
+    def attribute(self, plug: str) -> Union[AnimCurve, float]:
+        """Rate curve driving plug, or its static value when not animated."""
+        curve = self.driver(plug)
+        if curve is not None:
+            return curve.to_curve(self.fps)
+        for name, tokens in self.values.items():
+            if _same_plug(name, plug) and tokens:
+                return _number(tokens[0])
+        for name, default in self.defaults.items():
+            if _same_plug(name, plug):
+                return default
+        return 0.0
+
+
+def read_scene(path: str, nodes: Iterable[str] = ()) -> MayaScene:
+    """Reads animCurves, and the attributes of the given nodes, from path."""
+    with open(path, encoding="latin-1") as lines:
+        return parse_scene(lines, nodes)
+
+
+def read_controller(
+        path: str,
+        node: str = "oscillation_controller",
+        attributes: Iterable[str] = CONTROLLER_ATTRIBUTES
+) -> Dict[str, Union[AnimCurve, float]]:
+    """Curves or static values of the oscillation controller's attributes."""
+    scene = read_scene(path, [node])
+    return {
+        attribute: scene.attribute(f"{node}.{attribute}")
+        for attribute in attributes
+    }
+
+
+def parse_scene(lines: Iterable[str], nodes: Iterable[str] = ()) -> MayaScene:
+    """Builds a MayaScene from the lines of a .ma file, one pass, streaming."""
+    nodes = {_short(node) for node in nodes}
+    scene = MayaScene()
+    current = None
+    keys = {}
+    for tokens in _statements(lines, nodes, lambda: current):
+        command = tokens[0]
+        if command == "createNode" or command == "select":
+            _finish_curve(scene, current, keys)
+            current, keys = _node(tokens), {}
+        elif command == "setAttr" and current is not None:
+            if current[1].startswith("animCurve"):
+                _curve_attribute(tokens, keys)
+            elif _short(current[0]) in nodes:
+                attribute, values = _set_attr(tokens)
+                if attribute is not None:
+                    scene.values[current[0] + attribute] = values
+        elif command == "addAttr" and current is not None:
+            _add_attr(scene, current[0], tokens)
+        elif command == "connectAttr" and len(tokens) >= 3:
+            source, destination = _unquote(tokens[1]), _unquote(tokens[2])
+            if (_short(source.split(".")[0]) in scene.curves or
+                    _short(destination.split(".")[0]) in nodes):
+                scene.connections.append((source, destination))
+        elif command == "currentUnit":
+            scene.fps = _time_unit(tokens, scene.fps)
+    _finish_curve(scene, current, keys)
+    return scene
+
+
+def tangent_slopes(times, values, in_types,
+                   out_types) -> Tuple[np.ndarray, np.ndarray]:
+    """In and out slopes for keys with Maya tangent types.
+
+    Linear tangents follow the secant to the neighbouring key and flat and
+    step tangents are level. Auto and clamped tangents are smooth, level at
+    the ends, on plateaus and at extrema, and limited so a segment cannot
+    overshoot its keys. Any other type is treated as a smooth spline.
+    """
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    linear_in, linear_out = linear_slopes(times, values)
+    smooth = np.zeros(len(times))
+    if len(times) > 2:
+        smooth[1:-1] = (values[2:] - values[:-2]) / (times[2:] - times[:-2])
+    smooth[0], smooth[-1] = linear_out[0], linear_in[-1]
+    clamped = smooth.copy()
+    clamped[[0, -1]] = 0
+    if len(times) > 2:
+        before, after = linear_in[1:-1], linear_out[1:-1]
+        level = before * after <= 0
+        limit = 3 * np.minimum(np.abs(before), np.abs(after))
+        clamped[1:-1] = np.where(
+            level, 0, np.clip(clamped[1:-1], -limit, limit))
+    slopes = []
+    for types, linear in ((in_types, linear_in), (out_types, linear_out)):
+        types = np.asarray(types)
+        slopes.append(
+            np.select([
+                types == LINEAR, (types == FLAT) | (types == STEP),
+                (types == AUTO) | (types == CLAMPED)
+            ], [linear, 0, clamped], smooth))
+    return slopes[0], slopes[1]
+
+
+def _statements(lines: Iterable[str], nodes, current) -> Iterator[List[str]]:
+    """Tokenised statements that can matter, skipping everything else.
+
+    A statement is only accumulated when its command is one we read and, for
+    setAttr and addAttr, when the node it applies to is an animCurve or one
+    of the requested nodes. Skipped statements are scanned for their closing
+    semicolon without being stored.
+    """
+    buffer = None
+    inside = False
+    quoted = False
+    for line in lines:
+        while line:
+            if not inside:
+                line = line.lstrip()
+                if not line or line.startswith("//"):
+                    break
+                command = line.split(None, 1)[0].rstrip(";")
+                keep = command in ("createNode", "select", "connectAttr",
+                                   "currentUnit")
+                if command in ("setAttr", "addAttr"):
+                    node = current()
+                    keep = node is not None and (
+                        node[1].startswith("animCurve") or
+                        _short(node[0]) in nodes)
+                buffer = [] if keep else None
+                inside = True
+            if quoted or '"' in line:
+                end, quoted = _statement_end(line, quoted)
+            else:
+                end = line.find(";")
+            if end < 0:
+                if buffer is not None:
+                    buffer.append(line)
+                break
+            if buffer is not None:
+                buffer.append(line[:end])
+                yield _TOKEN.findall("".join(buffer))
+                buffer = None
+            inside = False
+            line = line[end + 1:]
+
+
+def _statement_end(line: str, quoted: bool) -> Tuple[int, bool]:
+    """Index of the first unquoted semicolon in line, and the quote state."""
+    escaped = False
+    for i, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = quoted
+        elif char == '"':
+            quoted = not quoted
+        elif char == ";" and not quoted:
+            return i, quoted
+    return -1, quoted
+
+
+def _node(tokens: List[str]) -> Optional[Tuple[str, str]]:
+    """(name, type) of the node a createNode or select statement targets."""
+    if tokens[0] == "createNode":
+        name = _flag(tokens, "-n")
+        return (_unquote(name) if name else "", tokens[1])
+    names = [token for token in tokens[1:] if not token.startswith("-")]
+    return (_unquote(names[0]).lstrip(":"), "") if names else None
+
+
+def _curve_attribute(tokens: List[str], keys: dict):
+    attribute, values = _set_attr(tokens)
+    if attribute is None:
+        return
+    match = _INDEX.match(attribute)
+    if match is None:
+        return
+    name, first, last = match.groups()
+    if name in ("tan", "wgt"):
+        keys[name] = values[0] if values else None
+    elif name in _KEY_ARRAYS:
+        first = int(first or 0)
+        width = 2 if name == "ktv" else 1
+        chunk = keys.setdefault(name, {})
+        for i in range(len(values) // width):
+            chunk[first + i] = [_number(v) for v in
+                                values[i * width:(i + 1) * width]]
+
+
+def _finish_curve(scene: MayaScene, current, keys: dict):
+    if current is None or not current[1].startswith("animCurve"):
+        return
+    ktv = keys.get("ktv", {})
+    order = sorted(ktv)
+    if not order:
+        return
+    default = int(_number(keys.get("tan") or AUTO))
+
+    def column(name, fill):
+        chunk = keys.get(name, {})
+        return np.array([chunk[i][0] if i in chunk else fill for i in order],
+                        dtype=float)
+
+    def tangents(x, y):
+        if x not in keys and y not in keys:
+            return None
+        return np.column_stack((column(x, np.nan), column(y, np.nan)))
+
+    pairs = np.array([ktv[i] for i in order], dtype=float)
+    scene.curves[_short(current[0])] = AnimCurveNode(
+        name=current[0],
+        node_type=current[1],
+        times=pairs[:, 0],
+        values=pairs[:, 1],
+        in_types=column("kit", default).astype(int),
+        out_types=column("kot", default).astype(int),
+        in_tangents=tangents("kix", "kiy"),
+        out_tangents=tangents("kox", "koy"),
+        weighted=keys.get("wgt") in ("yes", "1", "true"))
+
+
+def _set_attr(tokens: List[str]) -> Tuple[Optional[str], List[str]]:
+    """Attribute name and value tokens of a setAttr statement."""
+    i = 1
+    while i < len(tokens) and tokens[i].startswith("-") and not _is_number(
+            tokens[i]):
+        i += 2 if tokens[i] in _SET_ATTR_FLAGS else 1
+    if i >= len(tokens):
+        return None, []
+    return _unquote(tokens[i]), [_unquote(v) for v in tokens[i + 1:]]
+
+
+def _add_attr(scene: MayaScene, node: str, tokens: List[str]):
+    name = _flag(tokens, "-ln") or _flag(tokens, "-sn")
+    default = _flag(tokens, "-dv")
+    if name:
+        scene.defaults[f"{node}.{_unquote(name)}"] = _number(
+            default) if default else 0.0
+
+
+def _time_unit(tokens: List[str], fps: float) -> float:
+    unit = _flag(tokens, "-t") or _flag(tokens, "-time")
+    if unit is None:
+        return fps
+    unit = _unquote(unit)
+    if unit in TIME_UNITS:
+        return TIME_UNITS[unit]
+    if unit.endswith("fps"):
+        return float(unit[:-3])
+    return fps
+
+
+def _flag(tokens: List[str], flag: str) -> Optional[str]:
+    for i in range(len(tokens) - 1):
+        if tokens[i] == flag:
+            return tokens[i + 1]
+    return None
+
+
+def _same_plug(name: str, plug: str) -> bool:
+    node, _, attribute = name.partition(".")
+    other, _, other_attribute = plug.partition(".")
+    return _short(node) == _short(other) and (attribute.lstrip(".")
+                                              == other_attribute)
+
+
+def _short(name: str) -> str:
+    return name.rsplit("|", 1)[-1].lstrip(":")
+
+
+def _unquote(token: str) -> str:
+    if len(token) >= 2 and token[0] == token[-1] == '"':
+        return token[1:-1]
+    return token
+
+
+def _is_number(token: str) -> bool:
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _number(token) -> float:
+    if token in ("yes", "on", "true"):
+        return 1.0
+    if token in ("no", "off", "false"):
+        return 0.0
+    return float(token)
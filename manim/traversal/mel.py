@@ -0,0 +1,116 @@
+"""Vectorized evaluation of the oscillate.mel expression, outside Maya.
+
+`riemann` and `oscillate` reproduce the expression's numbers, including its
+left Riemann sum, for whole frame ranges at once. `riemann_loop` is a
+line-by-line port of the MEL procedure, kept as the reference they are
+checked against, along with fixed values for the demo scene, in
+tests/test_mel.py. Running the module compares the two on a scene:
+
+    python -m traversal.mel ../oscillate-demo.ma --end 448
+"""
+import argparse
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .curves import Rate, as_rate
+from .sampling import sample
+
+
+def riemann_loop(func: Rate, frame: float, step: float = 1) -> float:
+    """The riemann proc of oscillate.mel, one frame at a time.
+
+    Costs one call to func per step between 0 and frame, so evaluating a
+    range of n frames this way is O(n^2), like the expression in Maya.
+    """
+    func = as_rate(func)
+    if frame < 0:
+        step = step * -1
+    t = 0.0
+    result = 0.0
+    while abs(t) < abs(frame):
+        result += float(func(t)) * step
+        t += step
+    return result
+
+
+def riemann(func: Rate, frames, step: float = 1):
+    """The riemann proc of oscillate.mel for a whole array of frames.
+
+    Samples func once per step out to the furthest frame in each direction
+    and accumulates the terms in the same order as the MEL loop, so each
+    result is the running sum the loop stops at, bit for bit. The cost is
+    O(n + m) for n frames reaching m steps from 0.
+    """
+    if step <= 0:
+        raise ValueError("step must be positive")
+    func = as_rate(func)
+    frames = np.asarray(frames, dtype=float)
+    result = np.zeros(frames.shape)
+    for sign in (1, -1):
+        side = frames > 0 if sign > 0 else frames < 0
+        if not side.any():
+            continue
+        reach = np.abs(frames[side])
+        count = int(np.ceil(reach.max() / step)) + 1
+        # The loop advances t by repeated addition, so its sample times can
+        # drift from k * step; accumulate them the same way
+        times = np.concatenate(([0.0], np.cumsum(np.full(count, step))))
+        terms = sample(func, sign * times) * (sign * step)
+        sums = np.concatenate(([0.0], np.cumsum(terms)))
+        result[side] = sums[np.searchsorted(times, reach, side="left")]
+    return result if result.ndim else float(result)
+
+
+def oscillate(frames,
+              frequency: Rate,
+              amplitude: float = 1,
+              center: float = 0,
+              phase: float = 0,
+              time_offset: float = 0,
+              fps: float = 24):
+    """Value oscillate.mel assigns to cube.translateY at each frame."""
+    frames = np.asarray(frames, dtype=float)
+    return center + amplitude * np.sin(
+        riemann(frequency, frames + time_offset) / fps + phase)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m traversal.mel",
+        description="Check the vectorized oscillate.mel evaluator against a "
+        "port of the MEL loop on a scene's controller.")
+    parser.add_argument("scene", help="Maya ASCII scene with the controller")
+    parser.add_argument("--controller", default="oscillation_controller")
+    parser.add_argument("--start", type=float, default=0)
+    parser.add_argument("--end", type=float, required=True)
+    parser.add_argument("--by", type=float, default=1, help="frame step")
+    args = parser.parse_args(argv)
+
+    from .maya_ascii import read_scene
+    scene = read_scene(args.scene, [args.controller])
+    settings = {
+        name: scene.attribute(f"{args.controller}.{name}")
+        for name in ("frequency", "amplitude", "oscillationCenter", "phase",
+                     "timeOffset")
+    }
+    frames = np.arange(args.start, args.end + args.by / 2, args.by)
+    values = oscillate(frames,
+                       settings["frequency"],
+                       amplitude=settings["amplitude"],
+                       center=settings["oscillationCenter"],
+                       phase=settings["phase"],
+                       time_offset=settings["timeOffset"])
+    reference = np.array([
+        settings["oscillationCenter"] + settings["amplitude"] * np.sin(
+            riemann_loop(settings["frequency"], frame +
+                         settings["timeOffset"]) / 24 + settings["phase"])
+        for frame in frames
+    ])
+    error = float(np.max(np.abs(values - reference)))
+    print(f"{len(frames)} frames, max |vectorized - loop| = {error:.3g}")
+    return error
+
+
+if __name__ == "__main__":
+    main()
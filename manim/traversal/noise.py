@@ -0,0 +1,105 @@
+"""Vectorized 1-D gradient noise, matching the perlin_noise package."""
+import random
+from typing import Optional
+
+import numpy as np
+
+from . import instrument
+
+
+# Hashes below this get a dense gradient table; larger ones are memoised
+DENSE_SIZE = 1 << 16
+
+
+class GradientNoise:
+    """1-D gradient noise that evaluates whole arrays at once.
+
+    Produces the same values as `perlin_noise.PerlinNoise(octaves, seed)`
+    for 1-D coordinates. Lattice point i gets the gradient drawn by
+    `random.seed(seed * max(1, |i + 1|))`, and a coordinate blends the
+    gradients of its two lattice points with the 6v^5 - 15v^4 + 10v^3 fade.
+    Matching perlin_noise exactly is what forces one seeding per lattice
+    point. Gradients of hashes below DENSE_SIZE are precomputed into a
+    table that grows on demand, and those of larger hashes are drawn once
+    per distinct lattice point touched and memoised, so memory follows the
+    coordinates actually queried rather than their largest value. Lattice
+    indices are exact for |x * octaves| below 2**53.
+    """
+
+    def __init__(self,
+                 octaves: float = 1,
+                 seed: Optional[int] = None,
+                 table_size: int = 256):
+        if octaves <= 0:
+            raise ValueError("octaves must be positive")
+        self.octaves = octaves
+        self.seed = seed if seed else random.randint(1, 10**5)
+        self._gradients = np.zeros(1)
+        self._sparse = {}
+        self._grow(min(table_size, DENSE_SIZE))
+
+    def __call__(self, x):
+        if instrument.ENABLED:
+            instrument.count_call("evaluate", self, np.size(x))
+        x = np.asarray(x, dtype=float) * self.octaves
+        below = np.floor(x)
+        above = np.floor(x + 1)
+        near = x - below
+        far = x - above
+        result = (_fade(1 - near) * self._gradient(below) * near +
+                  _fade(1 + far) * self._gradient(above) * far)
+        return result if result.ndim else float(result)
+
+    def __getstate__(self):
+        # The gradient tables are rebuilt on demand, identically, so they
+        # are left out of pickles and of cache fingerprints
+        state = dict(vars(self))
+        del state["_gradients"], state["_sparse"]
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._gradients = np.zeros(1)
+        self._sparse = {}
+
+    def _gradient(self, lattice: np.ndarray) -> np.ndarray:
+        hashes = np.maximum(np.abs(lattice + 1), 1).astype(np.int64)
+        if not hashes.size:
+            return np.zeros(hashes.shape)
+        top = int(hashes.max())
+        if top >= len(self._gradients):
+            inside = hashes[hashes < DENSE_SIZE]
+            if inside.size and inside.max() >= len(self._gradients):
+                self._grow(min(2 * int(inside.max()), DENSE_SIZE))
+        if top < len(self._gradients):
+            return self._gradients[hashes]
+        dense = hashes < len(self._gradients)
+        result = np.empty(hashes.shape)
+        result[dense] = self._gradients[hashes[dense]]
+        result[~dense] = self._memoised(hashes[~dense])
+        return result
+
+    def _memoised(self, hashes: np.ndarray) -> np.ndarray:
+        """Gradients of large hashes, drawn once per distinct hash."""
+        unique, inverse = np.unique(hashes, return_inverse=True)
+        rng = random.Random()
+        for value in unique.tolist():
+            if value not in self._sparse:
+                rng.seed(self.seed * value)
+                self._sparse[value] = rng.uniform(-1, 1)
+        gradients = np.array(
+            [self._sparse[value] for value in unique.tolist()])
+        return gradients[inverse]
+
+    def _grow(self, size: int):
+        """Extends the gradient table to cover hashes below size."""
+        rng = random.Random()
+        gradients = np.empty(max(size - len(self._gradients), 0))
+        for offset in range(len(gradients)):
+            rng.seed(self.seed * (len(self._gradients) + offset))
+            gradients[offset] = rng.uniform(-1, 1)
+        self._gradients = np.concatenate((self._gradients, gradients))
+
+
+def _fade(v):
+    return 6 * v**5 - 15 * v**4 + 10 * v**3
@@ -0,0 +1,26 @@
+"""Evaluation of rate functions over arrays of times."""
+from typing import Callable
+
+import numpy as np
+
+from . import instrument
+
+
+def sample(func: Callable, t) -> np.ndarray:
+    """Evaluates func over an array of times in one call.
+
+    Rate functions written with NumPy operations are called once with the
+    whole array. Functions that only accept a single float are detected and
+    evaluated element by element instead.
+    """
+    t = np.asarray(t, dtype=float)
+    if instrument.ENABLED:
+        instrument.count_call("sample", func, t.size)
+    try:
+        values = np.asarray(func(t), dtype=float)
+    except (TypeError, ValueError):
+        values = None
+    if values is None or values.shape != t.shape:
+        values = np.array([func(x) for x in t.ravel()],
+                          dtype=float).reshape(t.shape)
+    return values
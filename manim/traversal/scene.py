@@ -0,0 +1,151 @@
+"""manim integration: a Scene base class for traversal sweeps.
+
+Kept out of the package namespace so the numerical tools never import
+manim, and out of the scene file so `manim render -a` doesn't pick it up
+as a scene of its own.
+"""
+import json
+import os
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from manim import (DEFAULT_WAIT_TIME, Scene, UpdateFromAlphaFunc,
+                   ValueTracker, config, linear)
+
+from . import instrument
+
+# TraversalScene drives Scene internals of this manim release, the one
+# pinned in conda_environment.yml
+MANIM_VERSION = "0.18"
+# "lo:hi" renders only frames lo <= frame < hi of the whole scene
+FRAME_RANGE = "TRAVERSAL_FRAME_RANGE"
+# A path to write the scene's frame count and rate to, without rendering
+FRAME_COUNT = "TRAVERSAL_FRAME_COUNT"
+
+
+class TraversalScene(Scene):
+    """Scene that sweeps trackers and reports where its frames spend time.
+
+    Run with TRAVERSAL_PROFILE=1 to print rate function evaluations,
+    integral lookups and updater times per frame when the scene ends, and
+    set TRAVERSAL_PROFILE_DIR to also save each scene's report as JSON.
+
+    Scenes animate with `play_sweep` and `wait`, whose frames depend only on
+    the frame number because Ω(t) is looked up directly. Setting
+    TRAVERSAL_FRAME_RANGE to "lo:hi" renders only frames lo <= frame < hi
+    of a full render, so separate processes can render segments of one
+    scene, see render_parallel.py.
+    """
+
+    def setup(self):
+        instrument.reset()
+        if instrument.ENABLED:
+            # A scene updater stops manim drawing waits as one frozen frame,
+            # so it is only added while profiling
+            self.add_updater(lambda dt: instrument.next_frame())
+        # Frames a full render would have written so far
+        self.frame = 0
+        self.frame_range = _frame_range()
+        self.counting = bool(os.environ.get(FRAME_COUNT))
+
+    def play_sweep(self,
+                   tracker: ValueTracker,
+                   end: float,
+                   run_time: float,
+                   rate_func: Callable[[float], float] = linear):
+        """Plays tracker.animate.set_value(end) over run_time.
+
+        Within a frame range only the sweep's frames inside it are played,
+        with the tracker at the value a full render gives each frame.
+        """
+        if self.frame_range is None and not self.counting:
+            self.play(tracker.animate.set_value(end),
+                      run_time=run_time,
+                      rate_func=rate_func)
+            return
+        start = tracker.get_value()
+        lo, hi = self._claim(run_time)
+        if hi > lo:
+            total = run_time * config.frame_rate
+
+            def update(mobject, alpha):
+                frame = lo + int(alpha * (hi - lo - 0.5) + 0.5)
+                mobject.set_value(start +
+                                  (end - start) * rate_func(frame / total))
+
+            self.play(UpdateFromAlphaFunc(tracker, update, rate_func=linear),
+                      run_time=_duration(hi - lo))
+        tracker.set_value(end)
+
+    def wait(self,
+             duration: float = DEFAULT_WAIT_TIME,
+             stop_condition: Optional[Callable[[], bool]] = None,
+             frozen_frame: Optional[bool] = None):
+        if self.frame_range is None and not self.counting:
+            return super().wait(duration, stop_condition, frozen_frame)
+        lo, hi = self._claim(duration,
+                             self._static_wait(stop_condition, frozen_frame))
+        if hi > lo:
+            # Played frame by frame, so the segment has exactly hi - lo
+            # frames; a static frame looks the same either way
+            super().wait(_duration(hi - lo), stop_condition, False)
+
+    def _static_wait(self, stop_condition, frozen_frame) -> bool:
+        """Whether a full render would write this wait as a frozen frame."""
+        if frozen_frame is not None:
+            return frozen_frame
+        return not (self.always_update_mobjects or self.updaters
+                    or stop_condition is not None
+                    or any(mobject.has_time_based_updater()
+                           for mobject in self.get_mobject_family_members()))
+
+    def _claim(self, run_time: float,
+               static: bool = False) -> Tuple[int, int]:
+        """Frames of the next run_time that fall in the frame range.
+
+        Returned relative to the animation's first frame, which a full
+        render plays at times 0, 1 / fps, ... below run_time, or repeats
+        int(run_time * fps) times for a static wait.
+        """
+        dt = 1 / config.frame_rate
+        if static:
+            frames = int(run_time / dt)
+        else:
+            frames = len(np.arange(0, run_time, dt))
+        first = self.frame
+        self.frame += frames
+        if self.frame_range is None:
+            return 0, 0
+        lo, hi = self.frame_range
+        return max(lo - first, 0), min(hi - first, frames)
+
+    def tear_down(self):
+        count = os.environ.get(FRAME_COUNT)
+        if count:
+            with open(count, "w") as out:
+                json.dump({
+                    "frames": self.frame,
+                    "fps": config.frame_rate
+                }, out)
+        if not instrument.ENABLED:
+            return
+        name = type(self).__name__
+        data = instrument.report()
+        instrument.print_report(name, data)
+        directory = os.environ.get("TRAVERSAL_PROFILE_DIR")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            instrument.export(os.path.join(directory, f"{name}.json"), data)
+
+
+def _frame_range() -> Optional[Tuple[int, int]]:
+    value = os.environ.get(FRAME_RANGE)
+    if not value:
+        return None
+    lo, hi = (int(part) for part in value.split(":"))
+    return lo, hi
+
+
+def _duration(frames: int) -> float:
+    """A run time that manim plays as exactly frames frames."""
+    return (frames - 0.5) / config.frame_rate
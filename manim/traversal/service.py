@@ -0,0 +1,363 @@
+"""Local preview service answering traversal queries from one warm cache.
+
+Preview tools and render workers connect over TCP and send one JSON object
+per line. Each request carries an "id" and an "op", and gets back a line
+with the same id and either a "result" or an "error":
+
+    {"id": 1, "op": "register", "curve": "freq", "times": [0, 48],
+     "values": [1, 5]}
+    {"id": 2, "op": "values", "curve": "freq", "frames": [1, 2, 3]}
+    {"id": 3, "op": "edit", "curve": "freq", "index": 1, "value": 3}
+
+Clients that sent {"op": "subscribe", "curve": ...} also get an
+{"event": "invalidate", ...} line whenever that curve is edited or replaced,
+carrying the `IntegralEdit` fields so cached frames can be dropped
+selectively. Infinite edit bounds are sent as JSON Infinity, which the
+Python json module reads back.
+
+Serving the curves of a Maya scene:
+
+    python -m traversal.service ../oscillate-demo.ma --port 8765
+"""
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .bake import TARGETS, bake
+from .curves import AnimCurve
+from .edits import IntegralEdit
+from .linear import PiecewiseLinear
+
+# Longest request or reply line, large enough for long frame lists
+LINE_LIMIT = 1 << 26
+# Largest |frame| accepted, about eleven hours at 24 fps
+FRAME_LIMIT = 1e6
+
+EVERYWHERE = IntegralEdit(-np.inf, np.inf, 0.0, 0.0)
+
+
+class PreviewService:
+    """Holds rate curves and their integral tables for many clients.
+
+    Every curve keeps its exact prefix-sum table, so a "values" request is
+    one vectorized lookup however many frames it asks for, and an "edit"
+    patches the table in place instead of rebuilding it.
+    """
+
+    def __init__(self, curves: Optional[Dict[str, AnimCurve]] = None):
+        self.curves = dict(curves or {})
+        self._subscribers = defaultdict(set)
+        self.server = None
+
+    async def start(self,
+                    host: str = "127.0.0.1",
+                    port: int = 0) -> Tuple[str, int]:
+        """Starts listening and returns the bound (host, port)."""
+        self.server = await asyncio.start_server(self._connection,
+                                                 host,
+                                                 port,
+                                                 limit=LINE_LIMIT)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def register(self, name: str, curve: AnimCurve):
+        """Adds or replaces a curve, invalidating everything cached for it."""
+        self.curves[name] = curve
+        self._publish(name, EVERYWHERE)
+
+    def edit(self, name: str, index: int, **key) -> IntegralEdit:
+        """Edits one key of a curve and notifies its subscribers."""
+        curve = self._curve(name)
+        if isinstance(curve, PiecewiseLinear):
+            if key.get("in_slope") is not None or key.get(
+                    "out_slope") is not None:
+                raise ValueError("linear curves have no free tangents")
+            edit = curve.set_key(index, key["value"])
+        else:
+            edit = curve.set_key(index, **key)
+        self._publish(name, edit)
+        return edit
+
+    def handle(self, request: dict, writer=None):
+        """Answers one decoded request; writer identifies the client."""
+        op = request.get("op")
+        if op == "register":
+            times = _array(request, "times", FRAME_LIMIT)
+            values = _array(request, "values")
+            if request.get("linear"):
+                curve = PiecewiseLinear(times, values)
+            else:
+                curve = AnimCurve(times, values,
+                                  _array(request, "in_slopes", required=False),
+                                  _array(request, "out_slopes",
+                                         required=False))
+            self.register(request["curve"], curve)
+            return None
+        if op == "curves":
+            return sorted(self.curves)
+        if op == "integral":
+            curve = self._curve(request["curve"])
+            return _encode(curve.integral(_frames(request)))
+        if op == "values":
+            target = request.get("target", "sin")
+            if target not in TARGETS:
+                raise ValueError(f"unknown target {target!r}")
+            if _number(request, "divisor", 24) == 0:
+                raise ValueError("divisor must not be zero")
+            return _encode(
+                bake(self._curve(request["curve"]),
+                     _frames(request, _number(request, "time_offset", 0)),
+                     amplitude=_number(request, "amplitude", 1),
+                     center=_number(request, "center", 0),
+                     phase=_number(request, "phase", 0),
+                     time_offset=_number(request, "time_offset", 0),
+                     divisor=_number(request, "divisor", 24),
+                     target=TARGETS[target](request.get("seed", 1)),
+                     riemann=request.get("riemann", False)))
+        if op == "edit":
+            edit = self.edit(request["curve"],
+                             request["index"],
+                             value=request.get("value"),
+                             in_slope=request.get("in_slope"),
+                             out_slope=request.get("out_slope"))
+            return edit._asdict()
+        if op == "subscribe":
+            self._curve(request["curve"])
+            self._subscribers[request["curve"]].add(writer)
+            return None
+        if op == "unsubscribe":
+            self._subscribers[request["curve"]].discard(writer)
+            return None
+        raise ValueError(f"unknown op {op!r}")
+
+    def _curve(self, name: str) -> AnimCurve:
+        try:
+            return self.curves[name]
+        except KeyError:
+            raise ValueError(f"unknown curve {name!r}") from None
+
+    def _publish(self, name: str, edit: IntegralEdit):
+        line = _line({"event": "invalidate", "curve": name, **edit._asdict()})
+        for writer in list(self._subscribers[name]):
+            if writer.is_closing():
+                self._subscribers[name].discard(writer)
+            else:
+                writer.write(line)
+
+    async def _connection(self, reader: asyncio.StreamReader,
+                          writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                request = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        request = {}
+                        raise ValueError("requests must be JSON objects")
+                    reply = {"result": self.handle(request, writer)}
+                except Exception as error:
+                    # Any failure is this request's error; the connection
+                    # and requests pipelined after it carry on
+                    reply = {"error": f"{type(error).__name__}: {error}"}
+                writer.write(_line({"id": request.get("id"), **reply}))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for subscribers in self._subscribers.values():
+                subscribers.discard(writer)
+            writer.close()
+
+
+class PreviewClient:
+    """Stand-in client for the preview service, as a tool would use it.
+
+    Replies are matched to requests by id, so several requests can be in
+    flight at once. Invalidations for subscribed curves arrive on the
+    `invalidations` queue as (curve, IntegralEdit) pairs.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._pending = {}
+        self._next_id = 0
+        self.invalidations = asyncio.Queue()
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls,
+                      host: str = "127.0.0.1",
+                      port: int = 8765) -> "PreviewClient":
+        reader, writer = await asyncio.open_connection(host,
+                                                       port,
+                                                       limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def request(self, op: str, **fields):
+        """Sends one request and waits for its result."""
+        self._next_id += 1
+        reply = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = reply
+        self._writer.write(_line({"id": self._next_id, "op": op, **fields}))
+        await self._writer.drain()
+        return await reply
+
+    async def register(self,
+                       curve: str,
+                       times,
+                       values,
+                       in_slopes=None,
+                       out_slopes=None,
+                       linear: bool = False):
+        fields = {"times": _encode(times), "values": _encode(values)}
+        for name, slopes in (("in_slopes", in_slopes), ("out_slopes",
+                                                        out_slopes)):
+            if slopes is not None:
+                fields[name] = _encode(slopes)
+        await self.request("register", curve=curve, linear=linear, **fields)
+
+    async def integral(self, curve: str, frames) -> np.ndarray:
+        """Ω of the curve at every frame."""
+        return np.asarray(await self.request(
+            "integral", curve=curve, frames=_encode(frames)))
+
+    async def values(self, curve: str, frames, **settings) -> np.ndarray:
+        """The oscillate output at every frame, see `bake` for settings."""
+        return np.asarray(await self.request(
+            "values", curve=curve, frames=_encode(frames), **settings))
+
+    async def edit(self,
+                   curve: str,
+                   index: int,
+                   value: Optional[float] = None,
+                   in_slope: Optional[float] = None,
+                   out_slope: Optional[float] = None) -> IntegralEdit:
+        return IntegralEdit(**await self.request("edit",
+                                                 curve=curve,
+                                                 index=index,
+                                                 value=value,
+                                                 in_slope=in_slope,
+                                                 out_slope=out_slope))
+
+    async def subscribe(self, curve: str):
+        await self.request("subscribe", curve=curve)
+
+    async def unsubscribe(self, curve: str):
+        await self.request("unsubscribe", curve=curve)
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._listener.cancel()
+
+    async def _listen(self):
+        try:
+            while line := await self._reader.readline():
+                message = json.loads(line)
+                if "event" in message:
+                    curve = message.pop("curve")
+                    del message["event"]
+                    await self.invalidations.put(
+                        (curve, IntegralEdit(**message)))
+                    continue
+                reply = self._pending.pop(message["id"], None)
+                if reply is None or reply.done():
+                    continue
+                if "error" in message:
+                    reply.set_exception(ValueError(message["error"]))
+                else:
+                    reply.set_result(message["result"])
+        except ConnectionError:
+            pass
+        finally:
+            for reply in self._pending.values():
+                if not reply.done():
+                    reply.set_exception(
+                        ConnectionError("preview service disconnected"))
+            self._pending.clear()
+
+
+def _frames(request: dict, time_offset: float = 0) -> np.ndarray:
+    frames = _array(request, "frames")
+    if np.any(np.abs(frames + time_offset) > FRAME_LIMIT):
+        raise ValueError(f"frames must be within ±{FRAME_LIMIT:g}")
+    return frames
+
+
+def _array(request: dict,
+           name: str,
+           limit: float = np.inf,
+           required: bool = True) -> Optional[np.ndarray]:
+    """A flat list of finite numbers from the request, within ±limit."""
+    if request.get(name) is None and not required:
+        return None
+    values = np.asarray(request[name], dtype=float)
+    if values.ndim != 1:
+        raise ValueError(f"{name} must be a flat list")
+    if not np.all(np.isfinite(values)):
+        raise ValueError(f"{name} must be finite")
+    if np.any(np.abs(values) > limit):
+        raise ValueError(f"{name} must be within ±{limit:g}")
+    return values
+
+
+def _number(request: dict, name: str, default: float) -> float:
+    value = float(request.get(name, default))
+    if not np.isfinite(value):
+        raise ValueError(f"{name} must be finite")
+    return value
+
+
+def _encode(values):
+    return np.asarray(values, dtype=float).tolist()
+
+
+def _line(message: dict) -> bytes:
+    return json.dumps(message).encode() + b"\n"
+
+
+async def serve(curves: Dict[str, AnimCurve], host: str, port: int):
+    service = PreviewService(curves)
+    host, port = await service.start(host, port)
+    print(f"serving {len(curves)} curves on {host}:{port}")
+    async with service.server:
+        await service.server.serve_forever()
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m traversal.service",
+        description="Serve traversal values of rate curves to local tools.")
+    parser.add_argument("scene",
+                        nargs="?",
+                        help="Maya ASCII scene whose animCurves to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    curves = {}
+    if args.scene:
+        from .maya_ascii import read_scene
+        scene = read_scene(args.scene)
+        curves = {
+            name: node.to_curve(scene.fps)
+            for name, node in scene.curves.items()
+        }
+    try:
+        asyncio.run(serve(curves, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""The rate functions and traversals animated by the explanatory scenes.
+
+They live here rather than in the scene file so bake and farm tasks can
+evaluate them with NumPy alone, without importing manim.
+"""
+from typing import Callable
+
+import numpy as np
+
+from .cumulative import cumulative_integral
+from .linear import PiecewiseLinear
+
+INTEGRATION_TOLERANCE = 1e-6
+
+
+def piecewise(a, b, f1, f2, t):
+    """Piecewise function that is constant until (a, f1), then ramps to (b, f2)
+
+    t may be a float or a NumPy array of times. The clamp is written with
+    np.minimum and np.maximum, which numba also compiles for scalars.
+    """
+    return f1 + (f2 - f1) * np.minimum(np.maximum((t - a) / (b - a), 0), 1)
+
+
+def omega(t):
+    """omega_func as plain code, which `jit.RateKernel` can compile"""
+    return piecewise(3 * np.pi, 5 * np.pi, 1, 5, t)
+
+
+def bounce_rate(t):
+    """bounce as plain code, which `jit.RateKernel` can compile"""
+    return piecewise(4 * np.pi - 0.2, 4 * np.pi + 0.2, 2, -2, t)
+
+
+# Same curve as omega, integrated exactly
+omega_func = PiecewiseLinear.ramp(3 * np.pi, 5 * np.pi, 1, 5)
+
+# Rate that turns around at 4 * PI, so the traversal runs back on itself
+bounce = PiecewiseLinear.ramp(4 * np.pi - 0.2, 4 * np.pi + 0.2, 2, -2)
+
+
+def bad_solution(t):
+    return np.sin(omega_func(t) * t)
+
+
+def integrate(t, func: Callable[[float], float]):
+    """Integral of func from 0 to t, looked up in a table cached per func
+
+    t may be a float or a NumPy array of times. Sampling adapts to omega so
+    the table stays within INTEGRATION_TOLERANCE.
+    """
+    return cumulative_integral(func, atol=INTEGRATION_TOLERANCE)(t)
+
+
+def good_solution_integrate(t):
+    return integrate(t, omega_func)
+
+
+def good_solution(t):
+    return np.sin(good_solution_integrate(t))
+
+
+def noise_solution(seed: int,
+                   func: Callable[[float], float] = omega_func) -> Callable:
+    """Noise traversed at rate func, f(t) = 3 noise(0.3 Ω(t))"""
+    from .noise import GradientNoise
+    noise = GradientNoise(seed=seed)
+
+    def noise_func(t):
+        return 3 * noise(0.3 * integrate(t, func))
+
+    return noise_func